@@ -1,7 +1,11 @@
+import os
+from utils.startup import mark
 from dash import dash, Dash, html, dcc, dash_table, page_registry
 import dash_bootstrap_components as dbc
+mark("imports")
 from utils.paths import resource_path
 from utils.config import CONFIG, SIDEBAR_STYLE, home_page_placeholders
+mark("config load")
 
 app = Dash(
     __name__,
@@ -34,10 +38,13 @@ app.layout = dbc.Container([
     # void components that need to be accessible across callbacks
     *home_page_placeholders,
     dcc.Store(id='app-state', storage_type='session', data=None),
+    dcc.Store(id='upload-job', data=None),
+    dcc.Interval(id='upload-job-poll', interval=500, disabled=True),
     dcc.Download(id="download-excel"),
     dcc.Download(id="download-excel-preview"),
     html.Button("Download visible rows", id="download-btn-preview", style={"display": "none"}), # Hidden
     html.Button("Download all data", id="download-btn", style={"display": "none"}),             # Hidden
+    html.Button("Annulla", id="cancel-upload-btn", style={"display": "none"}),                  # Hidden
     html.Div(dash_table.DataTable(id='preview-table'), style={"display": "none"}),              # Hidden
 
     # actual app layout:
@@ -55,6 +62,21 @@ app.layout = dbc.Container([
         }
     )
 ], fluid=True)
+mark("app build")  # includes importing the page modules
+
+# Opt-in callback metrics, served at /_callback-metrics (see utils/instrumentation.py)
+if os.getenv("CONTO_INSTRUMENT"):
+    from utils.instrumentation import instrument
+    instrument(app, profile_top=int(os.getenv("CONTO_PROFILE_TOP", "0")))
+
+# Load every owner's stored statement in the background, so that switching user finds it ready
+from utils.statements import STATEMENTS
+STATEMENTS.warm_in_background(CONFIG)
+
+# Old history parts are deleted by a background task, never while serving a request
+from utils.history import prune_in_background
+from utils.paths import app_data_dir
+prune_in_background(app_data_dir() / "data")
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,15 @@
+// Clientside callbacks: they run in the browser, without a round trip to the server
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    charts: {
+        // Show only the traces of the selected categories in a figure that already holds them all
+        showCategories: function(selected, figure) {
+            if (!figure || !figure.data) {
+                return window.dash_clientside.no_update;
+            }
+            const shown = new Set(selected || []);
+            return Object.assign({}, figure, {
+                data: figure.data.map(trace => Object.assign({}, trace, {visible: shown.has(trace.name)}))
+            });
+        }
+    }
+});
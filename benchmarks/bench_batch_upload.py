@@ -0,0 +1,58 @@
+"""Throughput of a batch upload: 12 monthly statements one after another vs in the process pool.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch_upload [--owner papà] [--files 12] [--rows 20000] [--format csv]
+"""
+import argparse
+import base64
+import time
+from concurrent.futures import wait
+from utils.config import CONFIG
+from utils.ingest import _get_pool, parse_upload
+from benchmarks.sandbox import temporary_data_home
+from benchmarks.synthetic import synthetic_statement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--owner", default=next(iter(CONFIG)))
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--rows", type=int, default=20_000, help="rows per file")
+    parser.add_argument("--format", default="csv", choices=["csv", "xlsx"])
+    args = parser.parse_args()
+    # Statements are built in a temporary app data folder, not the user's; the workers inherit it
+    with temporary_data_home():
+        run(args)
+
+
+def run(args):
+    filenames = [f"statement_{month:02d}.{args.format}" for month in range(1, args.files + 1)]
+    contents = [
+        "data:application/octet-stream;base64," + base64.b64encode(
+            synthetic_statement(args.owner, args.rows, args.format, seed=seed)).decode()
+        for seed in range(args.files)
+    ]
+
+    start = time.perf_counter()
+    for c, name in zip(contents, filenames):
+        parse_upload(args.owner, c, name)
+    sequential = time.perf_counter() - start
+
+    # Workers are started once per server; keep their start-up out of the measure
+    pool = _get_pool()
+    wait([pool.submit(parse_upload, args.owner, contents[0], filenames[0]) for _ in range(pool._max_workers)])
+    start = time.perf_counter()
+    wait([pool.submit(parse_upload, args.owner, c, name) for c, name in zip(contents, filenames)])
+    parallel = time.perf_counter() - start
+
+    total_rows = args.files * args.rows
+    print(f"{args.files} files x {args.rows} rows ({args.format}), {pool._max_workers} workers")
+    print(f"{'mode':>10} {'time [s]':>9} {'files/s':>8} {'rows/s':>10}")
+    for mode, elapsed in (("sequential", sequential), ("parallel", parallel)):
+        print(f"{mode:>10} {elapsed:>9.2f} {args.files / elapsed:>8.2f} {total_rows / elapsed:>10.0f}")
+    print(f"speedup: {sequential / parallel:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark the keyword categorizer against the previous row-by-row implementation.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_categorize [--owner papà] [--sizes 10000 100000 1000000]
+"""
+import argparse
+import time
+from utils.config import CONFIG
+from utils.categorizer import KeywordCategorizer
+from benchmarks.synthetic import synthetic_descriptions
+
+
+def legacy_categorize(descriptions, categories):
+    """The per-row matcher that BankStatement.categorize_expenses used to run."""
+    def categorize_row(description):
+        for category, keywords in categories.items():
+            if any(keyword.lower() in str(description).lower() for keyword in keywords):
+                return category
+        return 'Uncategorized'
+    return descriptions.apply(categorize_row)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--owner", default=next(iter(CONFIG)))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    categories = CONFIG[args.owner]["default_categories"]
+    print(f"{'rows':>10} {'legacy [s]':>12} {'compiled [s]':>13} {'speedup':>9}")
+    for n_rows in args.sizes:
+        descriptions = synthetic_descriptions(categories, n_rows)
+        expected, legacy_time = timed(legacy_categorize, descriptions, categories)
+        # Include the build so the comparison is fair for a cold cache
+        result, compiled_time = timed(lambda d: KeywordCategorizer(categories).categorize(d), descriptions)
+        assert result.equals(expected), "compiled categorizer diverged from the legacy matcher"
+        print(f"{n_rows:>10} {legacy_time:>12.3f} {compiled_time:>13.3f} {legacy_time / compiled_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
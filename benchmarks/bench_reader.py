@@ -0,0 +1,89 @@
+"""Benchmark the header-sniffing reader against the previous full `header=None` parse and a planned parse.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reader [--owner papà] [--sizes 10000 100000] [--formats csv xlsx]
+"""
+import argparse
+import base64
+import io
+import time
+import tracemalloc
+import pandas as pd
+from utils.config import CONFIG
+from utils.bankstatement import BankStatement
+from utils.plans import build_plan
+from utils.reader import read_statement
+from benchmarks.sandbox import temporary_data_home
+from benchmarks.synthetic import synthetic_statement
+
+
+def legacy_parse(owner, contents, filename):
+    """What handle_upload did before: decode twice, parse everything as object."""
+    decoded = base64.b64decode(contents.split(',')[1])
+    if filename.endswith('.csv'):
+        df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), header=None)
+    else:
+        df = pd.read_excel(io.BytesIO(decoded), header=None)
+    return BankStatement(owner).process_statement(df)
+
+
+def sniffing_parse(owner, contents, filename):
+    content_type, content_string = contents.split(',')
+    statement = BankStatement(owner)
+    return statement.process_statement(read_statement(base64.b64decode(content_string), filename, content_type, statement.headers))
+
+
+def planned_parse(owner, contents, filename, plan):
+    """What repeat uploads do once a parse plan is stored."""
+    content_type, content_string = contents.split(',')
+    statement = BankStatement(owner)
+    raw = base64.b64decode(content_string)
+    return statement.process_statement(read_statement(raw, filename, content_type, statement.headers, plan), plan)
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    # Separate run: tracing allocations distorts the timing
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--owner", default=next(iter(CONFIG)))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--formats", nargs="+", default=["csv", "xlsx"], choices=["csv", "xlsx"])
+    args = parser.parse_args()
+    # Statements are built in a temporary app data folder, not the user's
+    with temporary_data_home():
+        run(args)
+
+
+def run(args):
+    print(f"{'format':>6} {'rows':>8} {'legacy [s]':>11} {'legacy [MB]':>12} {'sniff [s]':>10} {'sniff [MB]':>11} "
+          f"{'plan [s]':>9} {'plan [MB]':>10}")
+    for file_format in args.formats:
+        for n_rows in args.sizes:
+            filename = f"statement.{file_format}"
+            contents = "data:application/octet-stream;base64," + base64.b64encode(
+                synthetic_statement(args.owner, n_rows, file_format)).decode()
+            expected, legacy_time, legacy_peak = measure(legacy_parse, args.owner, contents, filename)
+            result, sniff_time, sniff_peak = measure(sniffing_parse, args.owner, contents, filename)
+            assert len(result) == len(expected), "sniffing reader returned a different number of rows"
+            raw = base64.b64decode(contents.split(',')[1])
+            headers = BankStatement(args.owner).headers
+            plan = build_plan(raw, file_format, headers, read_statement(raw, filename, "", headers))
+            planned, plan_time, plan_peak = measure(planned_parse, args.owner, contents, filename, plan)
+            pd.testing.assert_frame_equal(planned, result)
+            print(f"{file_format:>6} {n_rows:>8} {legacy_time:>11.3f} {legacy_peak:>12.1f} {sniff_time:>10.3f} {sniff_peak:>11.1f} "
+                  f"{plan_time:>9.3f} {plan_peak:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
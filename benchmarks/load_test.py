@@ -0,0 +1,171 @@
+"""Load test of a running server: concurrent chart, zoom, preview and pivot callbacks.
+
+Start the server first, e.g. `python launcher.py --serve --threads 8`, then from the repository root:
+
+    python -m benchmarks.load_test [--url http://127.0.0.1:8050] [--owner papà] [--concurrency 16] [--duration 20]
+
+If the owner has no stored statement yet, a synthetic one (--seed-rows) is uploaded first.
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+import numpy as np
+from utils.config import CONFIG
+from benchmarks.synthetic import synthetic_statement
+
+
+class Client:
+    """Calls Dash callbacks over HTTP, resolving outputs from /_dash-dependencies."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.dependencies = self._request("/_dash-dependencies")
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        request = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=120) as response:
+            body = response.read()
+        return json.loads(body) if body else None
+
+    def _find(self, outputs, triggered):
+        wanted = [o.split("@")[0] for o in outputs]
+        for dep in self.dependencies:
+            parts = dep["output"].strip(".").split("...")
+            if [p.split("@")[0] for p in parts] == wanted and any(
+                    f"{i['id']}.{i['property']}" == triggered for i in dep["inputs"]):
+                return dep
+        raise LookupError(f"No callback for {outputs}")
+
+    def call(self, outputs, triggered, values):
+        """Run the callback writing `outputs`; `values` maps "id.prop" to input/state values."""
+        dep = self._find(outputs, triggered)
+        parts = dep["output"].strip(".").split("...")
+        outs = [dict(zip(("id", "property"), p.split(".", 1))) for p in parts]
+        payload = {
+            "output": dep["output"],
+            "outputs": outs if len(outs) > 1 else outs[0],
+            "inputs": [{**i, "value": values.get(f"{i['id']}.{i['property']}")} for i in dep["inputs"]],
+            "state": [{**s, "value": values.get(f"{s['id']}.{s['property']}")} for s in dep["state"]],
+            "changedPropIds": [triggered],
+        }
+        result = self._request("/_dash-update-component", payload)
+        return {} if result is None else result["response"]
+
+
+def load_state(client, owner, seed_rows):
+    """Dataset handle for the owner, uploading a synthetic statement if nothing is stored."""
+    outputs = ["output-div.children", "app-state.data", "data-upload-timestamp.data",
+               "upload-job.data", "upload-job-poll.disabled"]
+    response = client.call(outputs, "user-dropdown.value", {"user-dropdown.value": owner})
+    state = response.get("app-state", {}).get("data")
+    if state:
+        return state
+
+    contents = "data:text/csv;base64," + base64.b64encode(synthetic_statement(owner, seed_rows, "csv")).decode()
+    response = client.call(outputs, "upload-data.contents", {
+        "user-dropdown.value": owner, "upload-data.contents": [contents], "upload-data.filename": ["load_test.csv"]})
+    job = response["upload-job"]["data"]
+    poll = ["output-div.children", "app-state.data", "data-upload-timestamp.data", "upload-job-poll.disabled"]
+    while True:
+        time.sleep(0.5)
+        response = client.call(poll, "upload-job-poll.n_intervals",
+                               {"upload-job-poll.n_intervals": 1, "upload-job.data": job})
+        if response.get("app-state", {}).get("data"):
+            return response["app-state"]["data"]
+        if response.get("upload-job-poll", {}).get("disabled"):
+            raise RuntimeError("Seeding upload failed.")
+
+
+def workload(client, owner, state):
+    """Weighted list of (name, zero-argument request) pairs resembling interactive use."""
+    options = client.call(["category-dropdown.options", "category-dropdown.value"], "app-state.modified_timestamp",
+                          {"user-dropdown.value": owner, "app-state.data": state})
+    categories = options["category-dropdown"]["value"]
+    pages = max(1, state["rows"] // 10)
+    date_col = CONFIG[owner]["headers"]["date"]
+    full = client.call(["statement-graph-csum.figure"], "app-state.data", {"app-state.data": state, "user-dropdown.value": owner})
+    dates = sorted(np.concatenate([np.asarray(t["x"], dtype="datetime64[D]") for t in full["statement-graph-csum"]["figure"]["data"]]))
+
+    # Category toggles run in the browser: the server only draws a chart when the dataset changes
+    def chart():
+        client.call(["statement-graph.figure"], "app-state.data", {"app-state.data": state, "user-dropdown.value": owner})
+
+    def zoom():
+        start = random.choice(dates[:max(1, len(dates) - 90)])
+        relayout = {"xaxis.range[0]": str(start), "xaxis.range[1]": str(start + np.timedelta64(random.randint(30, 90), "D"))}
+        client.call(["statement-graph-csum.figure"], "statement-graph-csum.relayoutData", {
+            "app-state.data": state, "statement-graph-csum.relayoutData": relayout,
+            "category-dropdown-csum.value": random.sample(categories, random.randint(1, len(categories))),
+            "user-dropdown.value": owner})
+
+    def preview():
+        client.call(["preview-table.data", "preview-table.page_count"], "preview-table.page_current", {
+            "preview-table.page_current": random.randrange(pages), "preview-table.page_size": 10,
+            "preview-table.sort_by": random.choice([[], [{"column_id": date_col, "direction": "desc"}]]),
+            "preview-table.filter_query": "", "app-state.data": state})
+
+    def pivot():
+        client.call(["pivot-div.children"], "pivot-frequency.value",
+                    {"app-state.data": state, "pivot-frequency.value": random.choice("DWM")})
+
+    return [("chart", chart)] * 3 + [("zoom", zoom)] * 2 + [("preview", preview)] * 4 + [("pivot", pivot)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--owner", default=next(iter(CONFIG)))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--seed-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    client = Client(args.url)
+    state = load_state(client, args.owner, args.seed_rows)
+    requests = workload(client, args.owner, state)
+    latencies, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def user():
+        while time.perf_counter() < deadline:
+            name, request = random.choice(requests)
+            start = time.perf_counter()
+            try:
+                request()
+            except Exception:
+                with lock:
+                    errors[name] += 1
+                continue
+            with lock:
+                latencies[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.url}: {args.concurrency} concurrent users for {elapsed:.1f} s, {state['rows']} rows")
+    print(f"{'callback':>8} {'requests':>9} {'errors':>7} {'p50 [ms]':>9} {'p95 [ms]':>9}")
+    for name in sorted(set(latencies) | set(errors)):
+        ms = np.array(latencies[name] or [np.nan]) * 1000
+        print(f"{name:>8} {len(latencies[name]):>9} {errors[name]:>7} "
+              f"{np.percentile(ms, 50):>9.1f} {np.percentile(ms, 95):>9.1f}")
+    every = np.concatenate([latencies[n] for n in latencies]) * 1000 if latencies else np.array([np.nan])
+    total = sum(len(v) for v in latencies.values())
+    print(f"{'all':>8} {total:>9} {sum(errors.values()):>7} "
+          f"{np.percentile(every, 50):>9.1f} {np.percentile(every, 95):>9.1f}")
+    print(f"throughput: {total / elapsed:.1f} requests/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""Temporary app data folder for the benchmarks, so they never touch the user's statements."""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def temporary_data_home():
+    """Point the app data folder, derived from HOME (APPDATA on Windows), to a temporary folder.
+
+    Set before the first statement is built, it is inherited by the batch upload workers.
+    The folder is deleted and the variables restored on exit.
+    """
+    data_home = tempfile.mkdtemp(prefix="conto-bench-")
+    saved = {name: os.environ.get(name) for name in ("HOME", "APPDATA")}
+    os.environ["HOME"] = os.environ["APPDATA"] = data_home
+    try:
+        yield Path(data_home)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(data_home, ignore_errors=True)
@@ -0,0 +1,216 @@
+"""Benchmark suite: parse, categorize, persist, reload, register, figure build and callback round trip.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--owner papà] [--sizes 1000 10000 100000] [--formats csv xlsx] [--repeat 3]
+    python -m benchmarks.suite --save-baseline     # store the results in benchmarks/baseline.json
+
+Without --save-baseline each timing is compared with the stored baseline and the run exits
+with status 1 when a stage got slower than --tolerance. Statements are synthetic
+(benchmarks/synthetic.py) and the data folder is a temporary one, so real data is not touched.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from utils.config import CONFIG
+from benchmarks.synthetic import CONTENT_TYPES, synthetic_statement, upload_contents
+from benchmarks.load_test import Client
+from benchmarks.sandbox import temporary_data_home
+
+BASELINE = Path(__file__).with_name("baseline.json")
+MACHINE = f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU"
+
+
+class InProcessClient(Client):
+    """Same callback calls as the load test, through Flask's test client instead of HTTP."""
+
+    def __init__(self, server):
+        self.client = server.test_client()
+        super().__init__("")
+
+    def _request(self, path, payload=None):
+        response = self.client.get(path) if payload is None else self.client.post(path, json=payload)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"{path}: HTTP {response.status_code}")
+        return response.get_json() if response.data else None
+
+
+def timed(run, setup=lambda: (), repeat=3):
+    """Median seconds of `run(*setup())` over `repeat` runs; setup is not timed.
+
+    One more run goes first and is discarded: it pays for lazy imports and warms caches.
+    """
+    times = []
+    for _ in range(repeat + 1):
+        args = setup() or ()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times[1:])
+
+
+def run_case(owner, file_format, n_rows, repeat, client):
+    """{stage: seconds} for one synthetic statement."""
+    from utils.bankstatement import BankStatement
+    from utils.datasets import DATASETS
+    from utils.figure_cache import FIGURES
+    from utils.graph import category_graph, cumulative_graph
+    from utils.history import TransactionHistory
+    from utils.reader import read_statement
+    from utils.table_query import QUERIES
+
+    raw = synthetic_statement(owner, n_rows, file_format)
+    filename = f"statement.{file_format}"
+    headers = CONFIG[owner]["headers"]
+
+    def parse():
+        statement = BankStatement(owner)
+        return statement.process_statement(read_statement(raw, filename, CONTENT_TYPES[file_format], statement.headers))
+
+    def with_data(frame):
+        statement = BankStatement(owner)
+        statement.data = frame.copy()
+        return (statement,)
+
+    def empty_history(frame):
+        statement, = with_data(frame)
+        shutil.rmtree(statement.history.path)
+        statement.history.path.mkdir(parents=True)
+        TransactionHistory._cache.clear()
+        return (statement,)
+
+    parsed = parse()
+    categorized = with_data(parsed)[0].categorize_expenses()
+    results = {
+        "parse": timed(parse, repeat=repeat),
+        "categorize": timed(BankStatement.categorize_expenses, lambda: with_data(parsed), repeat),
+        "persist": timed(BankStatement.write_data, lambda: empty_history(categorized), repeat),
+        "reload": timed(lambda: BankStatement(owner).load_last_available_statement(),
+                        TransactionHistory._cache.clear, repeat),
+    }
+    stored = BankStatement(owner).load_last_available_statement()
+    results["register"] = timed(lambda: DATASETS.register(owner, stored["data"], stored["time_saved"]), repeat=repeat)
+    dataset = DATASETS.register(owner, stored["data"], stored["time_saved"])
+    categories = dataset.frame[headers["category"]].unique().tolist()
+    results["figure"] = timed(lambda: (category_graph(owner, dataset.cube, categories).to_plotly_json(),
+                                       cumulative_graph(owner, dataset.cube, categories).to_plotly_json()),
+                              repeat=repeat)
+
+    # Full Dash round trips, with the figure and query caches emptied so the work is redone
+    state = dataset.state()
+    results["callback_chart"] = timed(
+        lambda: client.call(["statement-graph.figure"], "app-state.data", {
+            "user-dropdown.value": owner, "app-state.data": state}),
+        FIGURES.clear, repeat)
+    results["callback_page"] = timed(
+        lambda: client.call(["preview-table.data", "preview-table.page_count"], "preview-table.page_current", {
+            "preview-table.page_current": 3, "preview-table.page_size": 10,
+            "preview-table.sort_by": [{"column_id": headers["value"], "direction": "asc"}],
+            "preview-table.filter_query": "", "app-state.data": state}),
+        QUERIES.clear, repeat)
+    return results
+
+
+def check_mixed_formats(owner, n_rows=500):
+    """Store a CSV and a typed xlsx statement in one history, then rewrite and export it.
+
+    Regression check: a column typed differently by the two readers (text in the CSV,
+    dates in the xlsx) loads as mixed objects, which Parquet cannot store.
+    Raises AssertionError when the uploads do not share their column types.
+    """
+    from utils.bankstatement import BankStatement
+    from utils.datasets import DATASETS
+    from utils.export import EXPORTS
+    from utils.history import TransactionHistory
+    from utils.ingest import parse_upload
+    from utils.schema import column_types
+
+    frames = [
+        parse_upload(owner, upload_contents(synthetic_statement(owner, n_rows, fmt, seed, typed=fmt == "xlsx"), fmt),
+                     f"statement.{fmt}")
+        for seed, fmt in enumerate(("csv", "xlsx"))
+    ]
+    assert column_types(frames[0]) == column_types(frames[1]), (column_types(frames[0]), column_types(frames[1]))
+    statement = BankStatement(owner)
+    shutil.rmtree(statement.history.path)
+    TransactionHistory._cache.clear()
+    for frame in frames:
+        statement.data = frame
+        statement.write_data()
+    TransactionHistory._cache.clear()
+    stored = BankStatement(owner).load_last_available_statement()
+    mixed = [col for col, dtype in stored["data"].dtypes.items() if dtype == object]
+    assert not mixed, f"Mixed columns in the history: {mixed}"
+    assert statement.history.rewrite(lambda frame: frame)
+    EXPORTS.export(DATASETS.register(owner, stored["data"], stored["time_saved"]), "parquet")
+    shutil.rmtree(statement.history.path)
+    TransactionHistory._cache.clear()
+
+
+def compare(results, baseline, tolerance):
+    """Print each timing next to its baseline; return the keys that got slower than `tolerance`."""
+    regressions = []
+    print(f"{'case':<36} {'time [ms]':>10} {'baseline':>10} {'ratio':>7}")
+    for key, seconds in results.items():
+        base = baseline.get(key)
+        ratio = seconds / base if base else float("nan")
+        # Ignore sub-5 ms differences: they are timer noise, not regressions
+        slower = base is not None and ratio > tolerance and seconds - base > 0.005
+        if slower:
+            regressions.append(key)
+        print(f"{key:<36} {seconds * 1000:>10.1f} {base * 1000 if base else float('nan'):>10.1f} "
+              f"{ratio:>6.2f}x{'  SLOWER' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--owner", default=next(iter(CONFIG)))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--formats", nargs="+", default=["csv"], choices=list(CONTENT_TYPES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    args = parser.parse_args()
+
+    results = {}
+    # Keep the user's statements out of it
+    with temporary_data_home():
+        from app import app
+
+        client = InProcessClient(app.server)
+        check_mixed_formats(args.owner)
+        print("CSV and xlsx uploads share one history: ok")
+        for file_format in args.formats:
+            for n_rows in args.sizes:
+                for stage, seconds in run_case(args.owner, file_format, n_rows, args.repeat, client).items():
+                    results[f"{args.owner}/{file_format}/{n_rows}/{stage}"] = seconds
+
+    stored = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    if stored and stored["machine"] != MACHINE:
+        print(f"Baseline recorded on {stored['machine']}: timings from another machine are not comparable.")
+    regressions = compare(results, stored.get("results", {}), args.tolerance)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "recorded": datetime.now().isoformat(timespec="seconds"),
+            "machine": MACHINE,
+            "python": platform.python_version(),
+            "results": {**stored.get("results", {}), **{k: round(v, 5) for k, v in results.items()}},
+        }, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} stage(s) slower than {args.tolerance}x the baseline.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Synthetic bank statements shaped like the owners' real ones in utils/config.json.
+
+    python -m benchmarks.synthetic --owner papà --rows 100000 --format xlsx -o MovimentiCC_2024-01-01.xlsx
+"""
+import argparse
+import base64
+import io
+import numpy as np
+import pandas as pd
+from utils.config import CONFIG
+from utils.reader import SNIFF_COLS, SNIFF_ROWS
+
+# Generic bank wording around the keywords, and rows that match no category
+NOISE = ["pagamento pos", "bonifico a favore di", "prelievo bancomat", "commissioni", "addebito sdd", "giroconto"]
+DETAILS = ["Carta *1234", "SDD", "Bonifico SEPA", ""]
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def synthetic_descriptions(categories, n_rows, seed=0):
+    """Descriptions where roughly 2/3 of the rows contain one of the category keywords."""
+    rng = np.random.default_rng(seed)
+    keywords = [k for kws in categories.values() for k in kws]
+    vocabulary = np.array(
+        [f"{rng.choice(NOISE)} {k.upper()} {rng.integers(1000, 9999)}" for k in keywords for _ in range(4)]
+        + [f"{n} {rng.integers(1000, 9999)}" for n in NOISE for _ in range(10)],
+        dtype=object,
+    )
+    return pd.Series(vocabulary[rng.integers(0, len(vocabulary), n_rows)])
+
+
+def _italian_amounts(values):
+    # 1234.5 -> "1.234,50": decimal comma, dots as thousands separators
+    return [f"{v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".") for v in values]
+
+
+def synthetic_frame(owner, n_rows, seed=0, years=5):
+    """The statement body as the bank exports it: text cells, newest movements first."""
+    rng = np.random.default_rng(seed)
+    headers = CONFIG[owner]["headers"]
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, years * 365, n_rows), unit="D")
+    dates = dates.sort_values(ascending=False)
+    # Everyday expenses plus a few large movements (salary, rent) that need thousands separators
+    values = np.where(rng.random(n_rows) < 0.02, rng.choice([2500.0, -1200.0, -1850.5], n_rows),
+                      rng.normal(-40, 60, n_rows).round(2))
+    # When the identifier column is the date column itself (e.g. "Data"), the dates win
+    columns = {
+        headers["loc_identif"]: (dates - pd.to_timedelta(rng.integers(0, 3, n_rows), unit="D")).strftime("%d/%m/%Y"),
+        headers["date"]: dates.strftime("%d/%m/%Y"),
+        headers["value"]: _italian_amounts(values),
+        headers["descript"]: synthetic_descriptions(CONFIG[owner]["default_categories"], n_rows, seed).to_numpy(),
+        headers["detail"]: rng.choice(DETAILS, n_rows),
+    }
+    return pd.DataFrame(columns)
+
+
+def _typed(owner, body):
+    # Dates and amounts as typed cells, as most banks' xlsx exports hold them
+    headers = CONFIG[owner]["headers"]
+    for col in {headers["loc_identif"], headers["date"]}:
+        body[col] = pd.to_datetime(body[col], format="%d/%m/%Y")
+    body[headers["value"]] = pd.to_numeric(body[headers["value"]].str.replace(".", "").str.replace(",", "."))
+    return body
+
+
+def synthetic_statement(owner, n_rows, file_format="csv", seed=0, banner_rows=2, leading_cols=1, typed=False):
+    """Bytes of a statement file whose header row sits below `banner_rows` title rows
+    and right of `leading_cols` empty columns, the offsets process_statement looks for.
+
+    With `typed` (xlsx only) dates and amounts are written as date and number cells.
+    """
+    if banner_rows >= SNIFF_ROWS or leading_cols >= SNIFF_COLS:
+        raise ValueError(f"The header must start within the first {SNIFF_ROWS} rows and {SNIFF_COLS} columns.")
+    body = synthetic_frame(owner, n_rows, seed)
+    if typed:
+        if file_format != "xlsx":
+            raise ValueError("Only xlsx statements hold typed cells.")
+        body = _typed(owner, body)
+    width = leading_cols + len(body.columns)
+    grid = [["Estratto conto"] + [None] * (width - 1)] if banner_rows else []
+    grid += [[None] * width for _ in range(banner_rows - 1)]
+    grid += [[None] * leading_cols + list(body.columns)]
+    grid += [[None] * leading_cols + list(row) for row in body.itertuples(index=False)]
+    buffer = io.BytesIO()
+    if file_format == "csv":
+        pd.DataFrame(grid).to_csv(buffer, header=False, index=False)
+    elif file_format == "xlsx":
+        pd.DataFrame(grid).to_excel(buffer, header=False, index=False)
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+    return buffer.getvalue()
+
+
+def upload_contents(raw, file_format):
+    """`raw` as the data URL a dcc.Upload component sends."""
+    return f"data:{CONTENT_TYPES[file_format]};base64," + base64.b64encode(raw).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--owner", default=next(iter(CONFIG)))
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--format", default="csv", choices=list(CONTENT_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--banner-rows", type=int, default=2)
+    parser.add_argument("--leading-cols", type=int, default=1)
+    parser.add_argument("--typed", action="store_true", help="xlsx only: dates and amounts as typed cells")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+    with open(args.output, "wb") as f:
+        f.write(synthetic_statement(args.owner, args.rows, args.format, args.seed, args.banner_rows, args.leading_cols, args.typed))
+
+
+if __name__ == '__main__':
+    main()
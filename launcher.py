@@ -1,27 +1,94 @@
+import argparse
+import os
 import threading
 import time
 import webbrowser
 import sys
-from app import app
+import urllib.request
+from utils.startup import mark, write_report
+
+HOST, PORT = '127.0.0.1', 8050
+URL = f'http://{HOST}:{PORT}'
+READY_TIMEOUT = 120  # seconds
 
 def run_server():
-    app.run(debug=False, port=8050)
+    # Imported here so that the heavy libraries and the page modules load in the server thread
+    from app import app
+    app.run(debug=False, host=HOST, port=PORT)
+
+def serve(host, port, threads, timeout, max_upload_mb):
+    """Shared-service mode: the app under waitress, a multi-threaded production WSGI server.
+
+    Threads rather than processes: datasets, upload jobs and caches live in process
+    memory and are guarded by locks, so every request sees the same state.
+    """
+    from waitress import serve as waitress_serve
+    from app import app
+
+    # Uploads travel base64-encoded inside the callback JSON: allow for the 4/3 overhead
+    max_body = int(max_upload_mb * 1024 ** 2 * 4 / 3) + 64 * 1024
+    app.server.config["MAX_CONTENT_LENGTH"] = max_body
+    write_report()
+    waitress_serve(
+        app.server,
+        host=host,
+        port=port,
+        threads=threads,
+        channel_timeout=timeout,
+        max_request_body_size=max_body,
+        ident="conto",
+    )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Conto: desktop app, or shared service with --serve.")
+    parser.add_argument("--serve", action="store_true", help="run under waitress without opening a browser")
+    parser.add_argument("--host", default=HOST, help="use 0.0.0.0 to accept other machines")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--threads", type=int, default=8, help="requests handled concurrently")
+    parser.add_argument("--timeout", type=int, default=120, help="seconds before an idle connection is closed")
+    parser.add_argument("--max-upload-mb", type=float, default=50, help="largest accepted upload request")
+    parser.add_argument("--instrument", action="store_true", help="record callback metrics at /_callback-metrics")
+    parser.add_argument("--profile-top", type=int, default=0, help="keep cProfile dumps of the N slowest callbacks")
+    # PyInstaller app bundles may receive extra arguments from the OS (e.g. -psn_* on macOS)
+    return parser.parse_known_args()[0]
+
+def wait_until_ready(server):
+    """Probe the layout endpoint until the server answers; False if it died or timed out."""
+    deadline = time.monotonic() + READY_TIMEOUT
+    while server.is_alive() and time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{URL}/_dash-layout', timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return False
 
 if __name__ == '__main__':
     # Required for PyInstaller (especially on Windows/Mac)
     import multiprocessing
     multiprocessing.freeze_support()
 
+    args = parse_args()
+    if args.instrument or args.profile_top:
+        # Read by app.py when it is imported
+        os.environ["CONTO_INSTRUMENT"] = "1"
+        os.environ["CONTO_PROFILE_TOP"] = str(args.profile_top)
+    if args.serve:
+        serve(args.host, args.port, args.threads, args.timeout, args.max_upload_mb)
+        sys.exit()
+
     # Start Dash in a separate thread
     t = threading.Thread(target=run_server)
     t.daemon = True
     t.start()
 
-    # Wait for server to boot
-    time.sleep(3)
-
-    # Open browser
-    webbrowser.open('http://127.0.0.1:8050')
+    # Open the browser as soon as the server answers
+    if wait_until_ready(t):
+        mark("first request")
+        write_report()
+        webbrowser.open(URL)
 
     # Keep main thread alive
     while t.is_alive():
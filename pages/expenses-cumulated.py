@@ -1,8 +1,10 @@
-from utils.graph import cumulative_graph
+from utils.graph import cumulative_graph, show_categories, xaxis_window
 from dash import html, dcc, Input, Output, State
-from dash import callback, register_page, no_update
-import pandas as pd
+from dash import callback, clientside_callback, ClientsideFunction, register_page, no_update
+from dash import callback_context as ctx
 from utils.config import CONFIG, home_page_placeholders
+from utils.datasets import get_dataset, get_frame
+from utils.figure_cache import FIGURES
 
 register_page(__name__, name="Spesa cumulata nel tempo, per categoria.")
 
@@ -24,9 +26,9 @@ layout = html.Div([
     State('user-dropdown', 'value'),
     State('app-state', 'data')
 )
-def update_dropdown_options(_, user, statement_data):
+def update_dropdown_options(_, user, statement_state):
+    statement_data = get_frame(statement_state)
     if statement_data is None: return no_update
-    statement_data = pd.DataFrame(statement_data)
     categories = statement_data[CONFIG[user]["headers"]["category"]].unique()
     return (
         [{'label': c, 'value': c} for c in categories],
@@ -35,13 +37,29 @@ def update_dropdown_options(_, user, statement_data):
 
 @callback(
     Output('statement-graph-csum', 'figure'),
+    Input('app-state', 'data'),
+    Input('statement-graph-csum', 'relayoutData'),
+    State('category-dropdown-csum', 'value'),
+    State('user-dropdown', 'value')
+)
+def update_graph(statement_state, relayout, selected_categories, user):
+    """One line per category, all of them: the dropdown only toggles their visibility."""
+    dataset = get_dataset(statement_state)
+    if dataset is None: return no_update
+    if ctx.triggered_id == 'statement-graph-csum':
+        # Zoom or pan: resample the visible window at full daily detail
+        changed, x_range = xaxis_window(relayout)
+        if not changed: return no_update
+        if x_range is not None:
+            return show_categories(cumulative_graph(user, dataset.cube, None, x_range).to_plotly_json(), selected_categories)
+        return show_categories(FIGURES.get(cumulative_graph, user, dataset), selected_categories)
+    return FIGURES.get(cumulative_graph, user, dataset)
+
+# Category selection never leaves the browser
+clientside_callback(
+    ClientsideFunction(namespace='charts', function_name='showCategories'),
+    Output('statement-graph-csum', 'figure', allow_duplicate=True),
     Input('category-dropdown-csum', 'value'),
-    State('user-dropdown', 'value'),
-    State('app-state', 'data')
+    State('statement-graph-csum', 'figure'),
+    prevent_initial_call=True
 )
-def update_graph(selected_categories, user, statement_data):
-    if statement_data is None: return no_update
-    statement_data = pd.DataFrame(statement_data)
-    filtered_data = statement_data[statement_data[CONFIG[user]["headers"]["category"]].isin(selected_categories)]
-    filtered_data = filtered_data.sort_values(CONFIG[user]["headers"]["date"])
-    return cumulative_graph(user, filtered_data)
@@ -1,8 +1,9 @@
 from utils.graph import category_graph
 from dash import html, dcc, Input, Output, State
-from dash import callback, register_page, no_update
-import pandas as pd
+from dash import callback, clientside_callback, ClientsideFunction, register_page, no_update
 from utils.config import CONFIG, home_page_placeholders
+from utils.datasets import get_dataset, get_frame
+from utils.figure_cache import FIGURES
 
 register_page(__name__, name="Movimenti bancari, suddivisi per categoria.")
 
@@ -24,9 +25,9 @@ layout = html.Div([
     State('user-dropdown', 'value'),
     State('app-state', 'data')
 )
-def update_dropdown_options(_, user, statement_data):
+def update_dropdown_options(_, user, statement_state):
+    statement_data = get_frame(statement_state)
     if statement_data is None: return no_update
-    statement_data = pd.DataFrame(statement_data)
     categories = statement_data[CONFIG[user]["headers"]["category"]].unique()
     return (
         [{'label': c, 'value': c} for c in categories],
@@ -35,13 +36,20 @@ def update_dropdown_options(_, user, statement_data):
 
 @callback(
     Output('statement-graph', 'figure'),
+    Input('app-state', 'data'),
+    State('user-dropdown', 'value')
+)
+def update_graph(statement_state, user):
+    """One trace per category, all of them: the dropdown only toggles their visibility."""
+    dataset = get_dataset(statement_state)
+    if dataset is None: return no_update
+    return FIGURES.get(category_graph, user, dataset)
+
+# Category selection never leaves the browser
+clientside_callback(
+    ClientsideFunction(namespace='charts', function_name='showCategories'),
+    Output('statement-graph', 'figure', allow_duplicate=True),
     Input('category-dropdown', 'value'),
-    State('user-dropdown', 'value'),
-    State('app-state', 'data')
+    State('statement-graph', 'figure'),
+    prevent_initial_call=True
 )
-def update_graph(selected_categories, user, statement_data):
-    if statement_data is None: return no_update
-    statement_data = pd.DataFrame(statement_data)
-    filtered_data = statement_data[statement_data[CONFIG[user]["headers"]["category"]].isin(selected_categories)]
-    filtered_data = filtered_data.sort_values(CONFIG[user]["headers"]["date"])
-    return category_graph(user, filtered_data)
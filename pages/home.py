@@ -1,18 +1,26 @@
 from dash import html, register_page, dcc, dash_table
 from dash import callback_context as ctx
-from dash import Input, Output, State, callback
+from dash import Input, Output, State, callback, no_update
 import dash_bootstrap_components as dbc
-import pandas as pd
 import logging
-import warnings
-import base64, io
-from utils.bankstatement import BankStatement
+from utils.datasets import get_dataset
+from utils.export import EXPORTS, FORMATS
+from utils.ingest import UPLOAD_STAGES, ingest_upload
+from utils.jobs import JOBS
+from utils.statements import STATEMENTS
+from utils.table_query import QUERIES
 
 logger = logging.getLogger(__name__)
 
 register_page(__name__, path="/", name= "Home - tabella")  # Root path
 
-preview_limit = 100  # Max number of rows to show in preview
+page_size = 10  # Rows per preview page, the only ones sent to the browser
+STAGE_LABELS = {
+    "decode": "Decodifica",
+    "parse": "Lettura",
+    "categorize": "Categorizzazione",
+    "persist": "Salvataggio",
+}
 
 layout = html.Div([
     dcc.Store(id="data-upload-timestamp", storage_type='session', data=None),
@@ -37,7 +45,7 @@ layout = html.Div([
             'textAlign': 'center',
             'margin': '10px'
         },
-        multiple=False
+        multiple=True
     ),
     html.Div(id='output-div'),
     html.Div(id='preview-div') # Preview area for uploaded/processed data
@@ -48,104 +56,126 @@ layout = html.Div([
     Output('output-div', 'children'),
     Output('app-state', 'data'),
     Output('data-upload-timestamp', 'data'),
+    Output('upload-job', 'data'),
+    Output('upload-job-poll', 'disabled'),
     Input('user-dropdown', 'value'),
     Input('upload-data', 'contents'),
     State('upload-data', 'filename'),
     State('data-upload-timestamp', 'data'),
 )
-def handle_upload(user, contents, filename, timestamp):
-    """Parse uploaded CSV/XLS file, categorize if possible and store in app state.
+def handle_upload(user, contents, filenames, timestamp):
+    """Load the stored history on user change, or start a background job for the uploaded files.
 
-    Returns a user-friendly message and the data as a list of records (or None on error).
+    The categorized DataFrame stays in the server-side dataset registry; app-state only
+    receives its handle. Uploads are processed by `ingest_upload` and delivered to
+    app-state by `poll_upload_job`.
     """
 
-    if ctx.triggered_id == "user-dropdown" or contents is None:
-        last = BankStatement(user)
-        last = last.load_last_available_statement()
-        df = last["data"]
-        if df is None:
-            return "Carica i tuoi estratti conto per iniziare a monitorare le tue spese.", None, timestamp
-        records = df.to_dict(orient="records")
-        logger.info("Loaded default statement with %d records.", len(records))
-        return f"Mostrando i dati caricati in sessione {last['time_saved']}.", records, last["time_saved"]
-
-    # Logic for when data is directly uploaded
-    try:
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        logger.info("Upload received: filename=%s, content_type=%s, bytes=%d", filename, content_type, len(decoded))
-
-        if filename and (filename.lower().endswith('.csv') or 'csv' in content_type):
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), header=None)
-        elif filename and (filename.lower().endswith(('.xls', '.xlsx')) or 'excel' in content_type):
-            df = pd.read_excel(io.BytesIO(decoded), header=None)
-        else:
-            logger.warning("Unsupported file type: %s (%s)", filename, content_type)
-            return f"Formato file non supportato: {filename}", None
-
-        st = BankStatement(user)
-        st.data = st.process_statement(df)
-        st.categorize_expenses()
-        records = st.data.to_dict(orient="records")
-
-        logger.info("Prepared %d records for storage in app-state.", len(records))
-
-        if records:
-            st.data = pd.DataFrame.from_records(records)
-            st.write_data(filename=f"categorized_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}_{filename}.xlsx")
-            updated_timestamp = pd.Timestamp.now().isoformat()
-            return f"✅ File '{filename}' caricato con successo! (righe: {len(records)})", records, updated_timestamp
-        else:
-            return f"File '{filename}' elaborato ma senza righe da salvare.", None, timestamp
+    if ctx.triggered_id == "user-dropdown" or not contents:
+        # Preloaded at startup and reloaded only when the owner's files change
+        dataset = STATEMENTS.get(user)
+        if dataset is None:
+            return "Carica i tuoi estratti conto per iniziare a monitorare le tue spese.", None, timestamp, None, True
+        logger.info("Showing the stored statement of %s with %d records.", user, len(dataset.frame))
+        return f"Mostrando i dati caricati in sessione {dataset.version}.", dataset.state(), dataset.version, None, True
 
-    except Exception as e:
-        logger.exception("Error while processing upload: %s", e)
-        return f"Errore durante il processamento del file: {e}", None, timestamp
+    job = JOBS.submit(UPLOAD_STAGES, ingest_upload, user, contents, filenames)
+    return render_job_status(job), no_update, no_update, job.id, False
+
+
+def render_job_status(job):
+    """Progress bar with a cancel button while running, the outcome message afterwards."""
+    if job.status == "error":
+        return f"Errore durante il processamento del file: {job.message}"
+    if job.status == "cancelled":
+        return "Caricamento annullato."
+    if job.result is not None:
+        if job.status == "done":
+            return job.result["message"]
+        return html.Div([
+            job.result["message"],
+            html.Div("Salvataggio in corso...", style={"fontSize": "12px", "color": "#666"})
+        ])
+    return html.Div([
+        dbc.Progress(
+            value=round(100 * job.progress()),
+            label=" ".join(filter(None, [STAGE_LABELS.get(job.stage, "In coda"), job.detail])),
+            style={"height": "20px"}
+        ),
+        html.Button("Annulla", id="cancel-upload-btn", style={"marginTop": "8px"})
+    ])
+
+
+@callback(
+    Output('output-div', 'children', allow_duplicate=True),
+    Output('app-state', 'data', allow_duplicate=True),
+    Output('data-upload-timestamp', 'data', allow_duplicate=True),
+    Output('upload-job-poll', 'disabled', allow_duplicate=True),
+    Input('upload-job-poll', 'n_intervals'),
+    State('upload-job', 'data'),
+    prevent_initial_call=True
+)
+def poll_upload_job(_, job_id):
+    """Report the progress of the running upload and hand its dataset over to app-state once."""
+    job = JOBS.get(job_id) if job_id else None
+    if job is None:
+        return no_update, no_update, no_update, True
+
+    result = job.take_result()
+    state, timestamp = no_update, no_update
+    if result is not None:
+        state = result["state"]
+        timestamp = result["timestamp"] or no_update
+    elif job.status == "error" and job.result is None:
+        state = None
+    finished = job.status in ("done", "error", "cancelled")
+    return render_job_status(job), state, timestamp, finished
+
+
+@callback(
+    Output('output-div', 'children', allow_duplicate=True),
+    Input('cancel-upload-btn', 'n_clicks'),
+    State('upload-job', 'data'),
+    prevent_initial_call=True
+)
+def cancel_upload(n_clicks, job_id):
+    job = JOBS.get(job_id) if n_clicks and job_id else None
+    if job is None:
+        return no_update
+    job.cancel()
+    return "Annullamento in corso..."
 
 
 @callback(
     Output('preview-div', 'children'),
     Input('app-state', 'data')
 )
-def render_preview(data):
-    """Render a DataTable showing up to 100 rows from the stored app-state data."""
-    if not data:
+def render_preview(state):
+    """Render a DataTable paged, sorted and filtered on the server over the whole dataset."""
+    dataset = get_dataset(state)
+    if dataset is None or dataset.frame.empty:
         return html.Div("Nessuna anteprima disponibile.")
+    df = dataset.frame
 
     try:
-        # Use raw records from app-state (limit to 100 rows)
-        records = data[:preview_limit]
-
-        # Build columns with basic type detection
-        cols = []
-        if records:
-            first = records[0]
-            for k, v in first.items():
-                col_type = 'text'
-                if isinstance(v, (int, float)):
-                    col_type = 'numeric'
-                else:
-                    try:
-                        sample = [row.get(k) for row in records if row.get(k) is not None]
-                        if sample:
-                            # Suppress pandas warning when formats are inconsistent; we just detect if parsing yields datetimes
-                            with warnings.catch_warnings():
-                                warnings.filterwarnings("ignore", message="Could not infer format")
-                                parsed = pd.to_datetime(sample, errors='coerce', infer_datetime_format=True)
-                            if parsed.notna().sum() > 0:
-                                col_type = 'datetime'
-                    except Exception:
-                        pass
-                cols.append({'name': k, 'id': k, 'type': col_type})
+        # Only the first page leaves the server; update_preview_page serves the others
+        records = df.head(page_size).to_dict(orient="records")
+        # Column types were read off the dtypes when the dataset was registered
+        cols = [{'name': k, 'id': k, 'type': t} for k, t in dataset.column_types.items()]
 
         table = dash_table.DataTable(
             id='preview-table',
             columns=cols,
             data=records,
-            page_action='native',
-            page_size=10,
-            sort_action='native',
-            filter_action='native',
+            page_action='custom',
+            page_current=0,
+            page_size=page_size,
+            page_count=max(1, -(-len(df) // page_size)),
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
             style_table={'overflowX': 'auto'},
             style_cell={'textAlign': 'left', 'whiteSpace': 'normal', 'height': 'auto'},
             style_header={'background': '#f9f9f9', 'fontWeight': 'bold'}
@@ -154,7 +184,15 @@ def render_preview(data):
         return html.Div([
             html.H4("Anteprima dati"),
             table,
-            html.Div(f"Mostrate {min(len(records), 100)} righe.", style={"marginTop": "8px", "fontSize": "12px", "color": "#666"}),
+            html.Div(f"{len(df)} righe in totale.", style={"marginTop": "8px", "fontSize": "12px", "color": "#666"}),
+            dcc.RadioItems(
+                id="export-format",
+                options=[{"label": label, "value": fmt} for fmt, label in FORMATS.items()],
+                value="xlsx",
+                inline=True,
+                inputStyle={"marginRight": "4px", "marginLeft": "12px"},
+                style={"marginTop": "20px"}
+            ),
             dbc.Row([
                 dbc.Col(
                     html.Button(
@@ -175,7 +213,7 @@ def render_preview(data):
                 # Keep dcc.Download components anywhere (they are invisible)
                 dcc.Download(id="download-excel-preview"),
                 dcc.Download(id="download-excel")
-            ], style={"marginTop": "20px"}),
+            ], style={"marginTop": "8px"}),
             html.Hr()
         ])
 
@@ -184,48 +222,57 @@ def render_preview(data):
         return html.Div(f"Errore nel render della preview: {e}")
 
 
+@callback(
+    Output('preview-table', 'data'),
+    Output('preview-table', 'page_count'),
+    Input('preview-table', 'page_current'),
+    Input('preview-table', 'page_size'),
+    Input('preview-table', 'sort_by'),
+    Input('preview-table', 'filter_query'),
+    State('app-state', 'data'),
+)
+def update_preview_page(page_current, size, sort_by, filter_query, state):
+    """Filter and sort the full dataset on the server and return only the requested page."""
+    dataset = get_dataset(state)
+    if dataset is None:
+        return no_update, no_update
+    result = QUERIES.query(dataset, filter_query, sort_by)
+    size = size or page_size
+    start = (page_current or 0) * size
+    return (
+        result.iloc[start:start + size].to_dict(orient="records"),
+        max(1, -(-len(result) // size))
+    )
+
+
 @callback(
     Output("download-excel-preview", "data"),
     Input("download-btn-preview", "n_clicks"),
-    State('preview-table', 'derived_virtual_data'),
+    State('preview-table', 'filter_query'),
+    State('preview-table', 'sort_by'),
+    State('export-format', 'value'),
+    State('app-state', 'data'),
     prevent_initial_call=True
 )
-def download_excel_preview(n_clicks, derived_data):
-    if not n_clicks:
+def download_excel_preview(n_clicks, filter_query, sort_by, file_format, state):
+    """Export every row matching the table's filter and sort, not only the visible page."""
+    dataset = get_dataset(state) if n_clicks else None
+    if dataset is None:
         return None
-    df = pd.DataFrame(derived_data if derived_data is not None else [])
-
-    # Try to coerce datetime-like columns into real datetimes for a better Excel export.
-    # Suppress the pandas 'Could not infer format' warning during detection/parsing.
-    try:
-        for col in df.select_dtypes(include=['object']).columns:
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", message="Could not infer format")
-                parsed = pd.to_datetime(df[col], errors='coerce', infer_datetime_format=True)
-            if parsed.notna().sum() > 0:
-                df[col] = parsed
-    except Exception:
-        logger.exception("Failed to coerce datetime columns for export; proceeding without coercion.")
-
-    return dcc.send_data_frame(
-        df.to_excel,
-        "statement_data_filtered.xlsx",
-        sheet_name="Movimenti",
-        index=False
-    )
+    # Written once per dataset version, query and format; repeat clicks reuse the file
+    path = EXPORTS.export(dataset, file_format, filter_query, sort_by)
+    return dcc.send_file(path, filename=f"statement_data_filtered.{file_format}")
 
 @callback(
     Output("download-excel", "data"),
     Input("download-btn", "n_clicks"),
+    State('export-format', 'value'),
     State('app-state', 'data'),
     prevent_initial_call=True
 )
-def download_excel(n_clicks, data):
+def download_excel(n_clicks, file_format, state):
     if not n_clicks: return None
-    df = pd.DataFrame(data) # Convert list of dicts back to DataFrame
-    return dcc.send_data_frame(
-        df.to_excel,
-        "statement_data.xlsx",
-        sheet_name="Movimenti",
-        index=False
-    )
+    dataset = get_dataset(state)
+    if dataset is None: return None
+    path = EXPORTS.export(dataset, file_format)
+    return dcc.send_file(path, filename=f"statement_data.{file_format}")
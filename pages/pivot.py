@@ -0,0 +1,44 @@
+from dash import html, dcc, dash_table, Input, Output
+from dash import callback, register_page
+from utils.aggregates import FREQUENCIES, FREQUENCY_LABELS, PERIOD, pivot
+from utils.config import home_page_placeholders
+from utils.datasets import get_dataset
+
+register_page(__name__, name="Tabella pivot per categoria.")
+
+layout = html.Div([
+    *home_page_placeholders,
+    dcc.RadioItems(
+        id='pivot-frequency',
+        options=[{'label': FREQUENCY_LABELS[f], 'value': f} for f in reversed(FREQUENCIES)],
+        value='M',
+        inline=True,
+        inputStyle={"marginRight": "4px", "marginLeft": "12px"}
+    ),
+    html.Div(id='pivot-div')
+])
+
+@callback(
+    Output('pivot-div', 'children'),
+    Input('app-state', 'data'),
+    Input('pivot-frequency', 'value')
+)
+def render_pivot(statement_state, freq):
+    """Period x category totals, read from the dataset's aggregate cube."""
+    dataset = get_dataset(statement_state)
+    if dataset is None:
+        return html.Div("Nessun dato disponibile.")
+    table = pivot(dataset.cube, freq).reset_index()
+    table[PERIOD] = table[PERIOD].dt.strftime('%Y-%m-%d' if freq != 'M' else '%Y-%m')
+    return dash_table.DataTable(
+        columns=[
+            {'name': str(c), 'id': str(c), 'type': 'numeric' if c != PERIOD else 'text'}
+            for c in table.columns
+        ],
+        data=table.rename(columns=str).to_dict(orient="records"),
+        page_size=24,
+        sort_action='native',
+        style_table={'overflowX': 'auto'},
+        style_cell={'textAlign': 'right'},
+        style_header={'background': '#f9f9f9', 'fontWeight': 'bold'}
+    )
@@ -0,0 +1,142 @@
+import copy
+from dash import html, dcc, dash_table, Input, Output, State
+from dash import callback, register_page, no_update
+from dash import callback_context as ctx
+import dash_bootstrap_components as dbc
+from utils.categorizer import UNCATEGORIZED
+from utils.config import CONFIG, home_page_placeholders
+from utils.datasets import get_dataset
+from utils.rules import update_rules
+from utils.suggest import MODELS
+
+register_page(__name__, name="Movimenti non categorizzati e parole chiave.")
+
+layout = html.Div([
+    *home_page_placeholders,
+    html.H4("Movimenti non categorizzati"),
+    dash_table.DataTable(
+        id='uncategorized-table',
+        columns=[
+            {'name': 'Descrizione', 'id': 'Descrizione', 'type': 'text'},
+            {'name': 'Movimenti', 'id': 'Movimenti', 'type': 'numeric'},
+            {'name': 'Totale', 'id': 'Totale', 'type': 'numeric'},
+            {'name': 'Suggerimento', 'id': 'Suggerimento', 'type': 'text'},
+            {'name': 'Confidenza %', 'id': 'Confidenza', 'type': 'numeric'},
+        ],
+        data=[],
+        row_selectable='single',
+        selected_rows=[],
+        page_size=15,
+        sort_action='native',
+        filter_action='native',
+        style_table={'overflowX': 'auto'},
+        style_cell={'textAlign': 'left'},
+        style_header={'background': '#f9f9f9', 'fontWeight': 'bold'}
+    ),
+    dbc.Row([
+        dbc.Col(dcc.Dropdown(id='rule-category', options=[], placeholder="Categoria"), width=4),
+        dbc.Col(dcc.Input(id='rule-keyword', type='text', placeholder="Parola chiave", style={"width": "100%"}), width=4),
+        dbc.Col(html.Button("Aggiungi", id='rule-add', style={"width": "100%"}), width=2),
+        dbc.Col(html.Button("Rimuovi", id='rule-remove', style={"width": "100%"}), width=2),
+    ], style={"marginTop": "20px"}),
+    html.Div(id='rule-keywords', style={"marginTop": "8px", "fontSize": "12px", "color": "#666"}),
+    html.Div(id='rule-message', style={"marginTop": "8px"}),
+])
+
+
+@callback(
+    Output('uncategorized-table', 'data'),
+    Output('uncategorized-table', 'selected_rows'),
+    Output('rule-category', 'options'),
+    Input('app-state', 'data'),
+    State('user-dropdown', 'value')
+)
+def render_uncategorized(statement_state, user):
+    """Distinct descriptions left Uncategorized, most frequent first, with the suggested category."""
+    dataset = get_dataset(statement_state)
+    if dataset is None:
+        return [], [], []
+    headers = CONFIG[dataset.owner]["headers"]
+    frame = dataset.frame
+    rows = frame[frame[headers["category"]] == UNCATEGORIZED]
+    table = (
+        rows.groupby(rows[headers["descript"]].astype(str))[headers["value"]]
+        .agg(Movimenti="count", Totale="sum")
+        .sort_values("Movimenti", ascending=False)
+        .rename_axis("Descrizione")
+        .reset_index()
+    )
+    table["Totale"] = table["Totale"].round(2)
+    suggestions = MODELS.suggest(dataset.owner, table["Descrizione"])
+    if suggestions is not None:
+        table["Suggerimento"] = suggestions["category"]
+        table["Confidenza"] = (suggestions["confidence"] * 100).round().where(suggestions["category"].notna())
+    return table.to_dict(orient="records"), [], list(CONFIG[dataset.owner]["default_categories"])
+
+
+@callback(
+    Output('rule-keyword', 'value'),
+    Output('rule-category', 'value'),
+    Input('uncategorized-table', 'selected_rows'),
+    State('uncategorized-table', 'data'),
+    prevent_initial_call=True
+)
+def pick_description(selected_rows, data):
+    """Start the keyword from the selected description, to be trimmed to its distinctive part,
+    and the category from its suggestion."""
+    if not selected_rows:
+        return no_update, no_update
+    row = data[selected_rows[0]]
+    return row["Descrizione"].lower(), row.get("Suggerimento") or no_update
+
+
+@callback(
+    Output('rule-keywords', 'children'),
+    Input('rule-category', 'value'),
+    Input('rule-message', 'children'),
+    State('user-dropdown', 'value')
+)
+def show_keywords(category, _, user):
+    keywords = CONFIG[user]["default_categories"].get(category) if category else None
+    if keywords is None:
+        return ""
+    return f"Parole chiave di {category}: {', '.join(keywords) if keywords else '(nessuna)'}"
+
+
+@callback(
+    Output('rule-message', 'children'),
+    Output('app-state', 'data', allow_duplicate=True),
+    Input('rule-add', 'n_clicks'),
+    Input('rule-remove', 'n_clicks'),
+    State('rule-category', 'value'),
+    State('rule-keyword', 'value'),
+    State('user-dropdown', 'value'),
+    State('app-state', 'data'),
+    prevent_initial_call=True
+)
+def edit_rule(add_clicks, remove_clicks, category, keyword, user, statement_state):
+    """Add or remove a keyword, then re-categorize only the rows it can affect."""
+    keyword = (keyword or "").strip().lower()
+    if not category or not keyword:
+        return "Scegli una categoria e una parola chiave.", no_update
+    # Make sure the dataset on screen is registered, so that it is updated too
+    get_dataset(statement_state)
+
+    categories = copy.deepcopy(CONFIG[user]["default_categories"])
+    keywords = [k.lower() for k in categories[category]]
+    if ctx.triggered_id == 'rule-add':
+        if keyword in keywords:
+            return f"'{keyword}' è già una parola chiave di {category}.", no_update
+        categories[category].append(keyword)
+        done = f"'{keyword}' aggiunta a {category}"
+    else:
+        if keyword not in keywords:
+            return f"'{keyword}' non è una parola chiave di {category}.", no_update
+        del categories[category][keywords.index(keyword)]
+        done = f"'{keyword}' rimossa da {category}"
+
+    changed = update_rules(user, categories)
+    dataset = changed.get(statement_state["key"]) if statement_state else None
+    if dataset is None:
+        return f"✅ {done}: nessun movimento cambia categoria.", no_update
+    return f"✅ {done}: dati aggiornati.", dataset.state()
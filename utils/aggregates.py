@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Cube frequencies, finest first
+FREQUENCIES = ("D", "W", "M")
+FREQUENCY_LABELS = {"D": "Giorno", "W": "Settimana", "M": "Mese"}
+PERIOD, CATEGORY, TOTAL, COUNT, RUNNING = "Periodo", "Categoria", "Totale", "Movimenti", "Cumulato"
+
+
+def _period_start(dates, freq):
+    if freq == "D":
+        return dates.dt.normalize()
+    return dates.dt.to_period(freq).dt.start_time
+
+
+def _aggregate(frame, freq, headers):
+    date_col, value_col, category_col = headers["date"], headers["value"], headers["category"]
+    return (
+        frame.assign(**{PERIOD: _period_start(frame[date_col], freq)})
+        .groupby([category_col, PERIOD], observed=True)[value_col]
+        .agg(**{TOTAL: "sum", COUNT: "count"})
+        .reset_index()
+        .rename(columns={category_col: CATEGORY})
+    )
+
+
+def _running(grouped):
+    grouped[RUNNING] = grouped.groupby(CATEGORY, observed=True)[TOTAL].cumsum()
+    return grouped
+
+
+def build_cube(frame, headers):
+    """Per-category aggregates for every frequency in FREQUENCIES.
+
+    Returns {freq: DataFrame[Periodo, Categoria, Totale, Movimenti, Cumulato]} sorted by
+    category and period; `Cumulato` is the running total of each category.
+    """
+    cube = {}
+    for freq in FREQUENCIES:
+        if frame.empty:
+            cube[freq] = pd.DataFrame(columns=[PERIOD, CATEGORY, TOTAL, COUNT, RUNNING])
+            continue
+        cube[freq] = _running(_aggregate(frame, freq, headers))
+    return cube
+
+
+def move_rows(cube, rows, previous, headers):
+    """New cube with `rows` moved from their `previous` categories to their current ones.
+
+    Only the moved rows are aggregated: their totals are taken off the old cells and added
+    to the new ones, merging with the cube's cells in numpy instead of regrouping the dataset.
+    """
+    values = rows[headers["value"]].to_numpy(dtype="float64")
+    counted = ~np.isnan(values)
+    amounts = np.where(counted, values, 0.0)
+    # Each moved row once with its new category and once, negated, with its old one
+    moved_names = np.concatenate([rows[headers["category"]].astype(object).to_numpy(), np.asarray(previous, dtype=object)])
+    moved_totals = np.concatenate([amounts, -amounts])
+    moved_counts = np.concatenate([counted, counted]).astype(np.int64) * np.repeat([1, -1], len(rows))
+    moved = {}
+    for freq, table in cube.items():
+        periods = _period_start(rows[headers["date"]], freq).to_numpy()
+        codes, table_names = pd.factorize(table[CATEGORY])
+        names = pd.Index(table_names).union(pd.Index(moved_names).unique())
+        category = np.concatenate([names.get_indexer(table_names)[codes], names.get_indexer(moved_names)])
+        period = np.concatenate([table[PERIOD].to_numpy(), periods, periods])
+        total = np.concatenate([table[TOTAL].to_numpy(dtype="float64"), moved_totals])
+        count = np.concatenate([table[COUNT].to_numpy(dtype=np.int64), moved_counts])
+
+        # Sum the cells sharing category and period, then drop the ones left without rows
+        order = np.lexsort((period, category))
+        category, period, total, count = category[order], period[order], total[order], count[order]
+        starts = np.flatnonzero(np.r_[True, (category[1:] != category[:-1]) | (period[1:] != period[:-1])])
+        category, period = category[starts], period[starts]
+        total, count = np.add.reduceat(total, starts), np.add.reduceat(count, starts)
+        keep = count > 0
+        category, period, total, count = category[keep], period[keep], total[keep], count[keep]
+
+        # Running totals restart at every category
+        running = np.cumsum(total)
+        first = np.flatnonzero(np.r_[True, category[1:] != category[:-1]])
+        offsets = np.r_[0.0, running][first]
+        running -= np.repeat(offsets, np.diff(np.r_[first, len(category)]))
+        moved[freq] = pd.DataFrame({
+            CATEGORY: pd.Categorical.from_codes(category, names).remove_unused_categories(),
+            PERIOD: period, TOTAL: total, COUNT: count, RUNNING: running,
+        })
+    return moved
+
+
+def pick_frequency(cube, max_periods):
+    """Finest frequency whose number of periods does not exceed `max_periods`."""
+    for freq in FREQUENCIES:
+        if cube[freq][PERIOD].nunique() <= max_periods:
+            return freq
+    return FREQUENCIES[-1]
+
+
+def select(cube, freq, categories):
+    """Rows of one frequency of the cube for the selected categories (all when None)."""
+    table = cube[freq]
+    if categories is None:
+        return table
+    return table[table[CATEGORY].isin(categories)]
+
+
+def pivot(cube, freq):
+    """Periods as rows, categories as columns, plus the period total."""
+    table = cube[freq].pivot_table(index=PERIOD, columns=CATEGORY, values=TOTAL, aggfunc="sum", observed=True)
+    table = table.fillna(0).round(2)
+    table[TOTAL] = table.sum(axis=1).round(2)
+    return table.sort_index(ascending=False)
@@ -1,60 +1,118 @@
-import os
-import sys
 import pandas as pd
 import re
-from pathlib import Path
 import logging
 from utils.config import CONFIG
+from utils.paths import app_data_dir
+from utils.categorizer import get_categorizer
+from utils.history import LEGACY_MARKER, TransactionHistory
+from utils.plans import detect_date_format
+from utils.rules import recategorize
+from utils.schema import compact
 
 logger = logging.getLogger(__name__)
 
 class BankStatement:
     def __init__(self, owner="papà", categories=None):
-        base_dir = Path.home() / ".bankstatementapp"
-        if sys.platform == "win32":
-            base_dir = Path(os.getenv('APPDATA')) / "BankStatementApp"
-        self.data_dir = base_dir / "data"
+        self.data_dir = app_data_dir() / "data"
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
         self.owner = owner
         self.headers = CONFIG[owner]["headers"]
         self.data = None
         self.categories = categories if categories else CONFIG[owner]["default_categories"]
+        self.history = TransactionHistory(
+            self.data_dir,
+            owner,
+            key_columns=list(dict.fromkeys(
+                self.headers[k] for k in ("date", "value", "descript", "detail") if k in self.headers
+            )),
+            category_col=self.headers.get("category", "Categoria"),
+        )
         self._update_logger("BankStatement initialized.")
 
     def _update_logger(self, message):
         logger.info(message)
 
-    def load_last_available_statement(self):
-        name_pattern = r'categorized_\d{8}_\d{6}_' + CONFIG[self.owner]["sourcedoc_namepattern"] + r'\.xlsx'
-        files = []
-        for file in self.data_dir.iterdir():
-            if re.match(name_pattern, file.name):
-                files.append(str(file.resolve()))
-        files.sort(reverse=True)
-        if not files:
-            self._update_logger("No matching Excel files found.")
-            return {"data" : None, "time_saved" : None}
-        # Remove files older than the past 3 ones
-        for old_file in files[3:]:
+    def _migrate_snapshots(self):
+        """Import legacy categorized_*.xlsx/.parquet snapshots into the history, once.
+
+        Imported snapshots are moved to `data_dir/legacy` so they are not picked up again.
+        Once they all are, a LEGACY_MARKER file in the owner's history folder skips the
+        scan of `data_dir` on later loads; delete it to import snapshots dropped in later.
+        """
+        marker = self.history.path / LEGACY_MARKER
+        if marker.exists():
+            return
+        name_pattern = r'categorized_\d{8}_\d{6}_' + CONFIG[self.owner]["sourcedoc_namepattern"] + r'.*\.(xlsx|parquet)$'
+        snapshots = sorted(
+            (file for file in self.data_dir.iterdir() if re.match(name_pattern, file.name)),
+            key=lambda file: file.name
+        )
+        legacy_dir = self.data_dir / "legacy"
+        failed = False
+        for file in snapshots:
             try:
-                os.remove(old_file)
-                logger.info(f"Removed old file: {old_file}")
+                legacy_dir.mkdir(exist_ok=True)
+                self.data = pd.read_excel(file) if file.suffix == ".xlsx" else pd.read_parquet(file)
+                self.compact_dtypes()
+                self.write_data()
+                file.rename(legacy_dir / file.name)
+                logger.info(f"Imported {file.name} into the transaction history.")
             except Exception as e:
-                logger.warning(f"Failed to remove old file {old_file}: {e}")
-        df = pd.read_excel(files[0])
-        time_of_saving = files[0].split('_')[1] + " " + files[0].split('_')[2]
-        self._update_logger(f"Loaded last available statement from {files[0]} saved at {time_of_saving}.")
+                failed = True
+                logger.warning(f"Failed to import {file}: {e}")
+        self.data = None
+        # Snapshots that failed are retried on the next load
+        if not failed:
+            marker.touch()
+
+    def load_last_available_statement(self):
+        self._migrate_snapshots()
+        df = self.history.load()
+        if df.empty:
+            self._update_logger("No stored transactions found.")
+            return {"data" : None, "time_saved" : None}
+        time_of_saving = self.history.version()
+        self._update_logger(f"Loaded transaction history of {self.owner} ({len(df)} rows) saved at {time_of_saving}.")
         return {
             "data" : df,
             "time_saved" : time_of_saving
         }
 
-    def process_statement(self, data=None):
+    def process_statement(self, data=None, plan=None):
         if data is not None:
             self.data = data
         elif self.data is None: return None
         flag = self.headers["loc_identif"]
+        # Frames coming from utils.reader already have their header row applied
+        if flag not in self.data.columns:
+            self._apply_header_row(flag)
+        dates = self.data[self.headers["date"]]
+        date_format = plan.get("date_format") if plan else detect_date_format(dates)
+        self.data[self.headers["date"]] = self._parse_dates(dates, date_format or "%d/%m/%Y")
+        values = self.data[self.headers["value"]]
+        if not pd.api.types.is_numeric_dtype(values):
+            if plan and plan.get("decimal"):
+                values = values.astype(str)
+                if plan.get("thousands"):
+                    values = values.str.replace(plan["thousands"], '', regex=False)
+                values = values.str.replace(plan["decimal"], '.', regex=False)
+            else:
+                # Decimal comma; dots are thousands separators only when a comma follows
+                values = values.astype(str).str.replace(r'\.(?=.*,)', '', regex=True).str.replace(',', '.')
+        self.data[self.headers["value"]] = pd.to_numeric(values, errors='coerce')
+        return self.data
+
+    @staticmethod
+    def _parse_dates(dates, date_format="%d/%m/%Y"):
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            return dates
+        # A statement has few distinct dates: parse each of them once
+        codes, uniques = pd.factorize(dates)
+        parsed = pd.to_datetime(pd.Index(uniques), format=date_format)
+        return pd.Series(parsed.array.take(codes, allow_fill=True), index=dates.index)
+
+    def _apply_header_row(self, flag):
         col_header_limit, row_header_limit = 10, 10
     
         headers_area = self.data.iloc[:col_header_limit, :row_header_limit]
@@ -68,9 +126,6 @@ class BankStatement:
             row_headers_index + 1:,
             col_headers_index:
             ].reset_index(drop=True)
-        self.data[self.headers["date"]] = pd.to_datetime(self.data[self.headers["date"]], format="%d/%m/%Y")
-        self.data[self.headers["value"]] = pd.to_numeric(self.data[self.headers["value"]].astype(str).str.replace(',', '.'), errors='coerce')
-        return self.data
 
     def categorize_expenses(self):
         description_col = self.headers.get("descript", "Descrizione")
@@ -78,16 +133,35 @@ class BankStatement:
         if description_col not in self.data.columns:
             raise ValueError(f"'{description_col}' column not found in data.")
     
-        def categorize_row(description):
-            for category, keywords in self.categories.items():
-                if any(keyword.lower() in str(description).lower() for keyword in keywords):
-                    return category
-            return 'Uncategorized'
-        
-        self.data[category_col] = self.data[description_col].apply(categorize_row)
+        categorizer = get_categorizer(self.categories)
+        self.data[category_col] = categorizer.categorize(self.data[description_col])
+        return self.data
+
+    def _with_current_rules(self, rows):
+        # Called under the history lock, which update_rules holds while switching the rules
+        current = CONFIG[self.owner]["default_categories"]
+        if current is self.categories or self.headers.get("category", "Categoria") not in rows.columns:
+            return rows
+        updated, positions, _ = recategorize(rows, self.headers, self.categories, current)
+        if updated is None:
+            return rows
+        logger.info(f"{len(positions)} new rows of {self.owner} re-categorized with the current rules.")
+        return updated
+
+    def compact_dtypes(self):
+        compact(self.data, self.headers)
         return self.data
     
-    def write_data(self, filename="categorized_statement.xlsx"):
-        output_path = self.data_dir / filename
-        self.data.to_excel(output_path, index=False)
-        self._update_logger(f"{self.__class__.__name__} data written to {output_path}")
+    def write_data(self):
+        """Append the rows of `self.data` not stored yet to the owner's history.
+
+        New rows are categorized again if the owner's rules changed since `self.categories`
+        were applied, e.g. by a rule edit while the upload was being parsed.
+        Returns the number of new rows.
+        """
+        category_col = self.headers.get("category", "Categoria")
+        if category_col in self.data.columns:
+            self.data[category_col] = self.data[category_col].astype("category")
+        added = self.history.append(self.data, prepare=self._with_current_rules)
+        self._update_logger(f"{self.__class__.__name__} data appended to {self.history.path} ({added} new rows)")
+        return added
@@ -0,0 +1,74 @@
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+UNCATEGORIZED = 'Uncategorized'
+
+
+def compile_keywords(keywords):
+    """One case-insensitive alternation regex matching lowercased text, None without keywords."""
+    if not keywords:
+        return None
+    # Longest first so that the alternation never stops on a shorter prefix
+    alternatives = sorted({k.lower() for k in keywords}, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(k) for k in alternatives))
+
+
+def distinct_descriptions(descriptions):
+    """Codes of `descriptions` and their distinct values lowercased, to match every value once.
+
+    Bank exports repeat the same descriptions a lot. Missing values are matched through
+    their str() form (e.g. 'nan'), as the old per-row loop did.
+    """
+    descriptions = pd.Series(descriptions)
+    codes, uniques = pd.factorize(descriptions)
+    missing = codes == -1
+    if missing.any():
+        extra, extra_uniques = pd.factorize(descriptions[missing].map(str))
+        codes[missing] = extra + len(uniques)
+        uniques = list(uniques) + list(extra_uniques)
+    return codes, pd.Series([str(u).lower() for u in uniques], dtype=object)
+
+
+class KeywordCategorizer:
+    """Keyword matcher compiled once per category set.
+
+    Every category becomes one case-insensitive alternation regex. Categories are
+    evaluated in their configured order, so the first matching category wins exactly
+    like the old per-row loop did.
+    """
+
+    def __init__(self, categories):
+        self.names = list(categories.keys())
+        self.patterns = [compile_keywords(keywords) for keywords in categories.values()]
+
+    def categorize(self, descriptions):
+        """Return a Series with the matching category for every description."""
+        descriptions = pd.Series(descriptions)
+        codes, lowered = distinct_descriptions(descriptions)
+
+        conditions = [
+            lowered.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+            if pattern is not None else np.zeros(len(lowered), dtype=bool)
+            for pattern in self.patterns
+        ]
+        if conditions:
+            matched = np.select(conditions, np.array(self.names, dtype=object), default=UNCATEGORIZED)
+        else:
+            matched = np.full(len(lowered), UNCATEGORIZED, dtype=object)
+        return pd.Series(matched[codes], index=descriptions.index)
+
+
+def _freeze(categories):
+    return tuple((name, tuple(keywords)) for name, keywords in categories.items())
+
+
+@lru_cache(maxsize=32)
+def _build(frozen):
+    return KeywordCategorizer(dict(frozen))
+
+
+def get_categorizer(categories):
+    """Return the compiled categorizer for a category dict, building it only once."""
+    return _build(_freeze(categories))
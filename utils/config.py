@@ -1,11 +1,23 @@
 import json
-from utils.paths import resource_path
+import sys
+from pathlib import Path
+from utils.paths import app_data_dir, resource_path
+from utils.storage import write_json
 from dash import dcc, html
 
+# The bundled config.json is read-only in a packaged build: edits go to the user's copy
+USER_CONFIG = app_data_dir() / "config.json"
+CONFIG_PATH = USER_CONFIG if getattr(sys, "frozen", False) else Path(resource_path("utils/config.json"))
+
 # config files:
-CONFIG = json.load(open(resource_path("utils/config.json")))
+CONFIG = json.load(open(CONFIG_PATH if CONFIG_PATH.exists() else resource_path("utils/config.json"), encoding="utf-8"))
 SIDEBAR_STYLE = json.load(open(resource_path("utils/sidebar_style.json")))
 
+
+def save_config():
+    """Write CONFIG to CONFIG_PATH atomically: a temporary file renamed over the old one."""
+    write_json(CONFIG_PATH, CONFIG)
+
 # placeholder components:
 data_preview_msg_placeholder = html.Div(
     id='output-div',
@@ -25,6 +37,7 @@ drag_and_drop_placeholder = dcc.Upload(
         style={"display": "none"}
     ), style={"display": "none"},  # Hidden
     contents=None,
+    multiple=True,
 )
 
 home_page_placeholders = [
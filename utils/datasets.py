@@ -0,0 +1,95 @@
+import logging
+import uuid
+from utils.aggregates import build_cube
+from utils.config import CONFIG
+from utils.lru import BoundedLRU
+from utils.schema import column_types
+
+logger = logging.getLogger(__name__)
+
+
+class Dataset:
+    """A categorized statement held in the server process."""
+
+    def __init__(self, key, owner, frame, version, cube=None):
+        self.key = key
+        self.owner = owner
+        self.frame = frame
+        self.version = version
+        # Column types for the preview table and exports, so they never re-infer them
+        self.column_types = column_types(frame)
+        # Aggregates are computed once here and shared by every chart of the dataset
+        self.cube = build_cube(frame, CONFIG[owner]["headers"]) if cube is None else cube
+        self.nbytes = int(frame.memory_usage(deep=True).sum()) + sum(
+            int(table.memory_usage(deep=True).sum()) for table in self.cube.values()
+        )
+
+    def state(self):
+        """Small JSON-serializable handle to put in the `app-state` store."""
+        return {
+            "key": self.key,
+            "owner": self.owner,
+            "version": self.version,
+            "rows": len(self.frame),
+        }
+
+
+class DatasetRegistry:
+    """Thread-safe LRU of datasets, bounded both in entries and in bytes.
+
+    The most recently registered dataset is never evicted, even if it alone
+    exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_entries=16, max_bytes=512 * 1024 ** 2):
+        self._entries = BoundedLRU(max_entries, max_bytes, size=lambda dataset: dataset.nbytes)
+
+    def register(self, owner, frame, version, key=None, cube=None):
+        dataset = Dataset(key or uuid.uuid4().hex, owner, frame, version, cube)
+        evicted = self._entries.put(dataset.key, dataset)
+        logger.info("Registered dataset %s for %s (%d rows, %.1f MB).",
+                    dataset.key, owner, len(frame), dataset.nbytes / 1024 ** 2)
+        for _, old in evicted:
+            logger.info("Evicted dataset %s for %s.", old.key, old.owner)
+        return dataset
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def discard(self, key):
+        """Forget the dataset `key`, e.g. rows that could not be persisted."""
+        self._entries.discard(key)
+
+    def owned_by(self, owner):
+        return [d for d in self._entries.values() if d.owner == owner]
+
+    def total_bytes(self):
+        return self._entries.total_size()
+
+
+DATASETS = DatasetRegistry()
+
+
+def get_dataset(state):
+    """Resolve an `app-state` handle to its Dataset.
+
+    Evicted datasets (or handles surviving a server restart) are reloaded from the
+    owner's last persisted statement and registered again under the same key.
+    """
+    if not state:
+        return None
+    dataset = DATASETS.get(state["key"])
+    if dataset is not None:
+        return dataset
+
+    from utils.bankstatement import BankStatement
+    last = BankStatement(state["owner"]).load_last_available_statement()
+    if last["data"] is None:
+        return None
+    logger.info("Dataset %s not in memory, reloaded from disk.", state["key"])
+    return DATASETS.register(state["owner"], last["data"], last["time_saved"], key=state["key"])
+
+
+def get_frame(state):
+    dataset = get_dataset(state)
+    return None if dataset is None else dataset.frame
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Indices of the `threshold` points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept; in between, each bucket keeps the point
+    forming the largest triangle with the previously kept point and the average of the
+    next bucket, which preserves the visual shape of the line. `x` must be sorted.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # threshold - 2 inner buckets
+    # Averages of every bucket, the last one being the final point alone
+    sizes = np.diff(np.append(edges, n))
+    mean_x = (np.add.reduceat(x, edges) / sizes).tolist()
+    mean_y = (np.add.reduceat(y, edges) / sizes).tolist()
+    # Buckets hold a handful of points: a plain loop beats numpy calls on tiny slices
+    xs, ys, bounds = x.tolist(), y.tolist(), edges.tolist()
+    keep = [0]
+    a = 0
+    for i in range(threshold - 2):
+        ax, ay = xs[a], ys[a]
+        next_x, next_y = mean_x[i + 1], mean_y[i + 1]
+        best, best_area = bounds[i], -1.0
+        for j in range(bounds[i], bounds[i + 1]):
+            area = abs((ax - next_x) * (ys[j] - ay) - (ax - xs[j]) * (next_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return np.array(keep, dtype=np.int64)
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import threading
+from utils.lru import BoundedLRU
+from utils.paths import app_data_dir
+from utils.storage import replacing
+from utils.table_query import QUERIES
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"xlsx": "Excel (.xlsx)", "csv": "CSV (.csv)", "parquet": "Parquet (.parquet)"}
+CHUNK_ROWS = 10_000  # Rows converted to Python values at a time by the xlsx writer
+DATE_FORMAT = "DD/MM/YYYY"
+
+
+def _write_xlsx(frame, column_types, path):
+    # Write-only workbooks stream rows to disk instead of keeping every cell in memory
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Movimenti")
+    sheet.append([str(col) for col in frame.columns])
+    dates = [column_types.get(col) == "datetime" for col in frame.columns]
+    for start in range(0, len(frame), CHUNK_ROWS):
+        chunk = frame.iloc[start:start + CHUNK_ROWS]
+        columns = []
+        for col in chunk.columns:
+            values = chunk[col].astype(object)
+            columns.append(values.where(values.notna(), None).tolist())
+        for row in zip(*columns):
+            cells = list(row)
+            for i, is_date in enumerate(dates):
+                if is_date and cells[i] is not None:
+                    cell = WriteOnlyCell(sheet, value=cells[i].to_pydatetime())
+                    cell.number_format = DATE_FORMAT
+                    cells[i] = cell
+            sheet.append(cells)
+    workbook.save(path)
+
+
+def _write_csv(frame, column_types, path):
+    # utf-8-sig lets Excel detect the encoding of accented descriptions
+    frame.to_csv(path, index=False, encoding="utf-8-sig", date_format="%Y-%m-%d", chunksize=CHUNK_ROWS)
+
+
+def _write_parquet(frame, column_types, path):
+    frame.to_parquet(path, index=False)
+
+
+WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv, "parquet": _write_parquet}
+
+
+class ExportCache:
+    """Exported files of datasets, written once per dataset version, query and format.
+
+    Files live in `exports/` of the app data folder, which is emptied the first time it
+    is used by a process. Entries are evicted (and their files deleted) beyond
+    `max_entries` or `max_bytes`, and when a newer version of the same dataset is exported.
+    """
+
+    def __init__(self, max_entries=16, max_bytes=512 * 1024 ** 2):
+        self._folder = None
+        # key -> (path, dataset key, version), weighed by the size of the file
+        self._entries = BoundedLRU(max_entries, max_bytes, size=lambda entry: entry[0].stat().st_size)
+        self._building = {}  # key -> lock held while the file is written
+        self._lock = threading.Lock()
+
+    def folder(self):
+        with self._lock:
+            if self._folder is None:
+                self._folder = app_data_dir() / "exports"
+                self._folder.mkdir(parents=True, exist_ok=True)
+                for leftover in self._folder.iterdir():
+                    leftover.unlink(missing_ok=True)
+            return self._folder
+
+    def export(self, dataset, file_format, filter_query=None, sort_by=None):
+        """Path of `dataset` filtered and sorted like the preview table, written as `file_format`."""
+        if file_format not in WRITERS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        query = json.dumps([filter_query or "", [[s["column_id"], s["direction"]] for s in sort_by or []]])
+        key = (dataset.key, dataset.version, file_format, query)
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        # Concurrent clicks on the same export wait for one writer instead of encoding twice
+        with building:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0].exists():
+                return entry[0]
+            try:
+                path = self._write(dataset, file_format, filter_query, sort_by, key)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+            stale = self._entries.discard_where(lambda k, e: e[1] == dataset.key and e[2] != dataset.version)
+            evicted = self._entries.put(key, (path, dataset.key, dataset.version))
+            self._delete(stale + evicted)
+        return path
+
+    def _write(self, dataset, file_format, filter_query, sort_by, key):
+        frame = dataset.frame if not filter_query and not sort_by else QUERIES.query(dataset, filter_query, sort_by)
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        path = self.folder() / f"{digest}.{file_format}"
+        with replacing(path) as tmp:
+            WRITERS[file_format](frame, dataset.column_types, tmp)
+        logger.info("Exported %d rows of dataset %s as %s (%.1f MB).",
+                    len(frame), dataset.key, file_format, path.stat().st_size / 1024 ** 2)
+        return path
+
+    @staticmethod
+    def _delete(entries):
+        for _, (path, _, _) in entries:
+            path.unlink(missing_ok=True)
+
+    def clear(self):
+        self._delete(self._entries.clear())
+
+
+EXPORTS = ExportCache()
@@ -0,0 +1,47 @@
+import logging
+from utils.lru import BoundedLRU
+
+logger = logging.getLogger(__name__)
+
+
+class FigureCache:
+    """Thread-safe LRU of chart figures, already serialized for Dash.
+
+    Entries are keyed by chart, owner, dataset and sorted categories, so a new
+    `app-state` (another dataset or a new version) never hits an old figure; when a
+    newer version of an owner's data is drawn, that owner's older figures are dropped.
+    """
+
+    def __init__(self, max_entries=64):
+        self.hits = 0
+        self.misses = 0
+        self._entries = BoundedLRU(max_entries)
+
+    def get(self, build, user, dataset, selected_categories=None):
+        """Figure of `build(user, dataset.cube, selected_categories)`, drawn at most once.
+
+        None selects every category, as the chart pages do (they hide traces in the browser).
+        """
+        categories = None if selected_categories is None else tuple(sorted(selected_categories))
+        key = (build.__name__, user, dataset.key, dataset.version, categories)
+        figure = self._entries.get(key)
+        if figure is not None:
+            self.hits += 1
+            return figure
+        self.misses += 1
+
+        figure = build(user, dataset.cube, selected_categories).to_plotly_json()
+        stale = self._entries.discard_where(lambda k, _: k[1] == user and k[3] != dataset.version)
+        self._entries.put(key, figure)
+        if stale:
+            logger.info("Dropped %d figures of older data for %s.", len(stale), user)
+        return figure
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        self._entries.clear()
+
+
+FIGURES = FigureCache()
@@ -1,23 +1,85 @@
-import plotly.express as px
+import numpy as np
+import pandas as pd
 from utils.config import CONFIG
+from utils.aggregates import PERIOD, CATEGORY, TOTAL, RUNNING, pick_frequency, select
+from utils.downsample import lttb
 
-def category_graph(user, filtered_data):
-    return px.histogram(
-        filtered_data,
-        x=CONFIG[user]["headers"]["date"],
-        y=CONFIG[user]["headers"]["value"],
-        color=CONFIG[user]["headers"]["category"],
-        title='Movimenti per Categoria nel Tempo',
-        nbins=100
+# Upper bound of plotted periods: the finest cube frequency within it is used
+HISTOGRAM_MAX_PERIODS = 100
+# Points per cumulative line, about the pixel width of the chart: more would not be visible
+CUMULATIVE_MAX_POINTS = 1000
+# Above this many points in a figure, lines are drawn with WebGL (Scattergl) instead of SVG
+WEBGL_MIN_POINTS = 5000
+
+def _labels(user):
+    return {
+        PERIOD: CONFIG[user]["headers"]["date"],
+        TOTAL: CONFIG[user]["headers"]["value"],
+        CATEGORY: CONFIG[user]["headers"]["category"],
+        RUNNING: 'Cumulative',
+    }
+
+def category_graph(user, cube, selected_categories):
+    import plotly.express as px  # only needed on a figure cache miss
+    freq = pick_frequency(cube, HISTOGRAM_MAX_PERIODS)
+    return px.bar(
+        select(cube, freq, selected_categories),
+        x=PERIOD,
+        y=TOTAL,
+        color=CATEGORY,
+        labels=_labels(user),
+        title='Movimenti per Categoria nel Tempo'
     )
 
-def cumulative_graph(user, filtered_data):
-    filtered_data['Cumulative'] = filtered_data.groupby(CONFIG[user]["headers"]["category"])[CONFIG[user]["headers"]["value"]].cumsum()
+def show_categories(figure, selected_categories):
+    """Server-side twin of the `charts.showCategories` clientside callback (assets/clientside.js):
+    a copy of the serialized `figure` where only the selected categories are visible."""
+    selected = set(selected_categories or [])
+    return {**figure, "data": [{**trace, "visible": trace.get("name") in selected} for trace in figure["data"]]}
+
+def _downsample(table, x_range=None):
+    """Daily running totals of each category, cut to `x_range` and reduced with LTTB."""
+    pieces = []
+    for _, group in table.groupby(CATEGORY, observed=True, sort=False):
+        dates = group[PERIOD].to_numpy()
+        if x_range is not None:
+            # One point beyond each edge, so that the lines reach the borders of the window
+            lo = max(np.searchsorted(dates, x_range[0].to_datetime64(), "left") - 1, 0)
+            hi = np.searchsorted(dates, x_range[1].to_datetime64(), "right") + 1
+            group, dates = group.iloc[lo:hi], dates[lo:hi]
+        keep = lttb(dates.astype("datetime64[ns]").astype("int64"), group[RUNNING].to_numpy(), CUMULATIVE_MAX_POINTS)
+        pieces.append(group.iloc[keep])
+    return pd.concat(pieces) if pieces else table.iloc[:0]
+
+def xaxis_window(relayout):
+    """Read a `relayoutData` event: (True, (start, end)) on zoom or pan, (True, None) when
+    the x axis is reset, (False, None) when it did not change (autosize, y-only zoom)."""
+    if not relayout:
+        return False, None
+    if relayout.get("xaxis.autorange"):
+        return True, None
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        bounds = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif "xaxis.range" in relayout:
+        bounds = relayout["xaxis.range"]
+    else:
+        return False, None
+    return True, (pd.Timestamp(bounds[0]), pd.Timestamp(bounds[1]))
+
+def cumulative_graph(user, cube, selected_categories, x_range=None):
+    """Daily running totals, downsampled to the chart resolution over the whole history
+    or, after a zoom, over `x_range` only."""
+    import plotly.express as px
+    table = _downsample(select(cube, "D", selected_categories), x_range)
     fig = px.line(
-        filtered_data,
-        x=CONFIG[user]["headers"]["date"],
-        y='Cumulative',
-        color=CONFIG[user]["headers"]["category"],
-        title='Spesa Cumulata per Categoria nel Tempo'
+        table,
+        x=PERIOD,
+        y=RUNNING,
+        color=CATEGORY,
+        labels=_labels(user),
+        title='Spesa Cumulata per Categoria nel Tempo',
+        render_mode="webgl" if len(table) > WEBGL_MIN_POINTS else "svg"
     )
+    if x_range is not None:
+        fig.update_xaxes(range=[x_range[0].isoformat(), x_range[1].isoformat()])
     return fig
@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from utils.schema import concat
+from utils.storage import file_lock, is_temporary, replacing, version_id, write_json
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMN = "_key"
+MAX_PARTS = 32  # Parts are compacted into one file beyond this
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+LEGACY_MARKER = "legacy_imported"  # Written once the owner's legacy snapshots are imported
+PRUNE_GRACE = 300  # Seconds a replaced part stays on disk for readers that listed it
+PRUNE_INTERVAL = 600
+
+
+def transaction_keys(frame, key_columns):
+    """Stable 64-bit key per transaction.
+
+    The key hashes the normalized key columns plus the occurrence number of identical
+    rows, so two genuinely identical transactions in one export are both kept while
+    re-uploading the same export adds nothing.
+    """
+    normalized = {}
+    for col in (c for c in key_columns if c in frame.columns):
+        values = frame[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            normalized[col] = values.astype("datetime64[ns]").astype("int64")
+        elif pd.api.types.is_numeric_dtype(values):
+            normalized[col] = (values.astype("float64") * 100).round().fillna(0).astype("int64")
+        else:
+            normalized[col] = values.astype(object).fillna("").astype(str).str.strip()
+    hashed = pd.util.hash_pandas_object(pd.DataFrame(normalized, index=frame.index), index=False)
+    occurrence = hashed.groupby(hashed).cumcount()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({"row": hashed.to_numpy(), "occurrence": occurrence.to_numpy()}), index=False
+    ).to_numpy()
+
+
+class TransactionHistory:
+    """Append-only, deduplicated transaction store of one owner.
+
+    Every append that brings new rows writes one Parquet part in `history/<owner>/`.
+    Known keys and the loaded frame are cached in process, so an upload that mostly
+    overlaps earlier data only pays for its new rows.
+
+    `manifest.json` lists the live parts: readers take it instead of listing the folder,
+    and writers, holding the owner's `.lock` file, write each part to a temporary file,
+    rename it and then replace the manifest, so readers never see a partial part.
+    Parts replaced by a compaction or rewrite are only deleted by `prune()`, after
+    PRUNE_GRACE seconds.
+    """
+
+    _cache = {}  # part directory -> {"parts": tuple, "keys": ndarray, "frame": DataFrame | None}
+    _lock = threading.Lock()
+
+    def __init__(self, data_dir, owner, key_columns, category_col=None):
+        self.path = data_dir / "history" / owner
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.owner = owner
+        self.key_columns = key_columns
+        self.category_col = category_col
+
+    @property
+    def manifest(self):
+        return self.path / MANIFEST
+
+    def _read_manifest(self):
+        try:
+            return json.loads(self.manifest.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access for writers, across threads and processes."""
+        # Adopted before locking: adopting takes the lock itself
+        self.parts()
+        with file_lock(self.path / LOCK_FILE):
+            yield
+
+    def parts(self):
+        """Names of the live parts, oldest first."""
+        manifest = self._read_manifest()
+        if manifest is None:
+            manifest = self._adopt_parts()
+        return tuple(manifest["parts"])
+
+    def _adopt_parts(self):
+        # Histories written before the manifest: list their parts once
+        with file_lock(self.path / LOCK_FILE):
+            manifest = self._read_manifest()
+            if manifest is None:
+                manifest = {"parts": sorted(p.name for p in self.path.glob("part_*.parquet")), "obsolete": {}}
+                write_json(self.manifest, manifest)
+        return manifest
+
+    def _publish(self, entry, parts, replaced=()):
+        """Make `parts` the live ones; `replaced` parts are left to prune()."""
+        manifest = self._read_manifest() or {}
+        obsolete = dict(manifest.get("obsolete", {}))
+        obsolete.update((part, time.time()) for part in replaced)
+        write_json(self.manifest, {"parts": list(parts), "obsolete": obsolete})
+        entry["parts"] = tuple(parts)
+
+    def _write_part(self, frame):
+        part = f"part_{version_id()}.parquet"
+        with replacing(self.path / part) as tmp:
+            frame.to_parquet(tmp, index=False)
+        return part
+
+    def version(self):
+        """Timestamp of the newest part as 'YYYYmmdd HHMMSS', or None when empty."""
+        parts = self.parts()
+        if not parts:
+            return None
+        return " ".join(parts[-1].split("_")[1:3])
+
+    def _entry(self):
+        parts = self.parts()
+        entry = self._cache.get(self.path)
+        if entry is None or entry["parts"] != parts:
+            keys = [pd.read_parquet(self.path / p, columns=[KEY_COLUMN])[KEY_COLUMN].to_numpy() for p in parts]
+            entry = {"parts": parts, "keys": np.concatenate(keys) if keys else np.empty(0, dtype="uint64"), "frame": None}
+            self._cache[self.path] = entry
+        return entry
+
+    def _read(self, parts):
+        frame = concat(pd.read_parquet(self.path / p, memory_map=True) for p in parts)
+        return self._restore_dtypes(frame)
+
+    def _restore_dtypes(self, frame):
+        # Parts written before dtypes were compacted may hold the category as text
+        if self.category_col in frame.columns and not isinstance(frame[self.category_col].dtype, pd.CategoricalDtype):
+            frame[self.category_col] = frame[self.category_col].astype("category")
+        return frame
+
+    def with_keys(self, frame):
+        """`frame` with its transaction key column (kept if already there)."""
+        if KEY_COLUMN in frame.columns:
+            return frame
+        return frame.assign(**{KEY_COLUMN: transaction_keys(frame, self.key_columns)})
+
+    @staticmethod
+    def _new_mask(keys, known):
+        # Also drops repeated keys, e.g. the same transaction in two files of one batch
+        return ~np.isin(keys, known) & ~pd.Series(keys).duplicated().to_numpy()
+
+    def unseen(self, frame):
+        """Rows of `frame` not stored yet, with their key column."""
+        frame = self.with_keys(frame)
+        with self._lock:
+            known = self._entry()["keys"]
+        return frame.loc[self._new_mask(frame[KEY_COLUMN].to_numpy(), known)].reset_index(drop=True)
+
+    def merged(self, frame):
+        """Full history as it will be once `frame` is appended, without writing anything.
+
+        Returns the merged frame and the number of new rows.
+        """
+        added = self.unseen(frame).drop(columns=[KEY_COLUMN])
+        return self._restore_dtypes(concat([self.load(), added])), len(added)
+
+    def append(self, frame, prepare=None):
+        """Store the rows of `frame` not seen before; return how many were added.
+
+        `prepare(rows)`, if given, gets the new rows under the owner's lock and returns
+        them as they are to be stored.
+        """
+        frame = self.with_keys(frame)
+        keys = frame[KEY_COLUMN].to_numpy()
+        with self._lock, self._locked():
+            entry = self._entry()
+            new = self._new_mask(keys, entry["keys"])
+            if not new.any():
+                logger.info("History of %s: no new rows.", self.owner)
+                return 0
+            added = frame.loc[new].reset_index(drop=True)
+            if prepare is not None:
+                added = prepare(added)
+            part = self._write_part(added)
+            self._publish(entry, entry["parts"] + (part,))
+
+            entry["keys"] = np.concatenate([entry["keys"], keys[new]])
+            if entry["frame"] is not None:
+                entry["frame"] = self._restore_dtypes(concat([entry["frame"], added]))
+            if len(entry["parts"]) > MAX_PARTS:
+                self._compact(entry)
+        logger.info("History of %s: appended %d new rows of %d.", self.owner, int(new.sum()), len(frame))
+        return int(new.sum())
+
+    def _compact(self, entry):
+        frame = entry["frame"] if entry["frame"] is not None else self._read(entry["parts"])
+        part = self._replace_parts(entry, frame)
+        logger.info("History of %s compacted into %s.", self.owner, part)
+
+    def _replace_parts(self, entry, frame):
+        # Readers holding the old manifest can still open the old parts until they are pruned
+        part = self._write_part(frame)
+        self._publish(entry, (part,), replaced=entry["parts"])
+        entry["frame"] = frame
+        return part
+
+    def rewrite(self, update):
+        """Replace the stored rows with `update(frame)`, written as a single part.
+
+        `update` gets the full history (key column included) and returns the new frame,
+        or None to leave the history untouched. Returns True when it was rewritten.
+        """
+        with self._lock, self._locked():
+            entry = self._entry()
+            frame = entry["frame"] if entry["frame"] is not None else self._read(entry["parts"])
+            updated = update(frame)
+            if updated is None:
+                return False
+            part = self._replace_parts(entry, updated)
+        logger.info("History of %s rewritten into %s.", self.owner, part)
+        return True
+
+    def prune(self, grace=PRUNE_GRACE):
+        """Delete replaced parts and leftover files once they are `grace` seconds old.
+
+        Replaced parts are timed from their replacement, unlisted part and temporary
+        files (e.g. from an interrupted write) from their modification time.
+        Returns the number of files deleted.
+        """
+        cutoff = time.time() - grace
+        removed = 0
+        with self._locked():
+            manifest = self._read_manifest()
+            live, obsolete = set(manifest["parts"]), dict(manifest.get("obsolete", {}))
+            with os.scandir(self.path) as entries:
+                for e in entries:
+                    is_part = e.name.startswith("part_") and e.name.endswith(".parquet")
+                    if (not is_part and not is_temporary(e.name)) or e.name in live:
+                        continue
+                    if obsolete.get(e.name, e.stat().st_mtime) > cutoff:
+                        continue
+                    try:
+                        os.unlink(e.path)
+                    except OSError as error:
+                        # Still open somewhere on Windows: retried on the next run
+                        logger.debug("Could not delete %s: %s", e.path, error)
+                        continue
+                    obsolete.pop(e.name, None)
+                    removed += 1
+            present = {name for name in obsolete if (self.path / name).exists()}
+            if present != set(manifest.get("obsolete", {})):
+                write_json(self.manifest, {"parts": manifest["parts"], "obsolete": {n: obsolete[n] for n in present}})
+        if removed:
+            logger.info("History of %s: %d old files deleted.", self.owner, removed)
+        return removed
+
+    def load(self):
+        """Full history of the owner, without the internal key column."""
+        with self._lock:
+            entry = self._entry()
+            if entry["frame"] is None:
+                entry["frame"] = self._read(entry["parts"])
+            frame = entry["frame"]
+        return frame.drop(columns=[KEY_COLUMN], errors="ignore")
+
+
+def prune_histories(data_dir, grace=PRUNE_GRACE):
+    """Run TransactionHistory.prune() on the history of every owner in `data_dir`."""
+    root = data_dir / "history"
+    if not root.is_dir():
+        return
+    for path in root.iterdir():
+        if path.is_dir():
+            TransactionHistory(data_dir, path.name, key_columns=[]).prune(grace)
+
+
+def prune_in_background(data_dir, interval=PRUNE_INTERVAL):
+    """Prune every history each `interval` seconds in a daemon thread, off the request path."""
+    def run():
+        while True:
+            try:
+                prune_histories(data_dir)
+            except Exception:
+                logger.exception("Could not prune the histories in %s.", data_dir)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="history-retention", daemon=True)
+    thread.start()
+    return thread
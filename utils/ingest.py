@@ -0,0 +1,154 @@
+import base64
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from utils.bankstatement import BankStatement
+from utils.config import CONFIG
+from utils.datasets import DATASETS
+from utils.jobs import JobCancelled
+from utils.plans import PLANS
+from utils.reader import read_statement
+from utils.schema import concat
+from utils.statements import STATEMENTS
+from utils.suggest import MODELS
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_STAGES = ("decode", "parse", "categorize", "persist")
+MAX_WORKERS = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Process pool shared by batch uploads, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, min(os.cpu_count() or 1, MAX_WORKERS)))
+        return _pool
+
+
+def parse_upload(user, contents, filename, job=None, categories=None):
+    """Decode, parse and categorize one uploaded file; None if its type is unsupported.
+
+    Module-level so that batch uploads can run it in worker processes (without a job).
+    Workers keep the CONFIG they imported, so they get the current rules as `categories`.
+    """
+    if job: job.advance("decode")
+    content_type, content_string = contents.split(',')
+    decoded = base64.b64decode(content_string)
+    logger.info("Upload received: filename=%s, content_type=%s, bytes=%d", filename, content_type, len(decoded))
+
+    if job: job.advance("parse")
+    st = BankStatement(user, categories)
+    plan = PLANS.lookup(user, filename, content_type)
+    if plan is not None:
+        try:
+            st.process_statement(read_statement(decoded, filename, content_type, st.headers, plan), plan)
+        except ValueError as e:
+            # PlanMismatch, or dates not in the plan's format: detect everything again
+            logger.info("Parse plan of %s does not fit %s (%s).", user, filename, e)
+            plan = None
+    if plan is None:
+        df = read_statement(decoded, filename, content_type, st.headers)
+        if df is None:
+            return None
+        plan = PLANS.detect(user, filename, content_type, decoded, df)
+        st.process_statement(df, plan)
+        if plan is not None:
+            PLANS.store(user, filename, plan)
+
+    if job: job.advance("categorize")
+    st.categorize_expenses()
+    # Compacted in the worker: smaller frames to pickle back from the process pool
+    return st.compact_dtypes()
+
+
+def parse_batch(job, user, contents, filenames, categories=None):
+    """Run parse_upload on every file in parallel; frames come back in upload order."""
+    job.advance("parse")
+    pool = _get_pool()
+    categories = categories or CONFIG[user]["default_categories"]
+    futures = {pool.submit(parse_upload, user, c, name, None, categories): i for i, (c, name) in enumerate(zip(contents, filenames))}
+    frames = [None] * len(futures)
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                frames[index] = future.result()
+            except Exception as e:
+                raise ValueError(f"{filenames[index]}: {e}") from e
+            job.report(f"{done}/{len(futures)}")
+    except (JobCancelled, ValueError):
+        for future in futures:
+            future.cancel()
+        raise
+    return frames
+
+
+def ingest_upload(job, user, contents, filenames):
+    """Background pipeline of an upload of one or more files: decode, parse, categorize, persist.
+
+    Batches are parsed in a process pool and merged into one frame ordered by date. The
+    merged dataset is published as soon as categorization is done, so charts can render
+    while the new rows are still being appended to the history. If appending fails, the
+    merged dataset is dropped and the stored history published again in its place.
+    """
+    if isinstance(contents, str):
+        contents, filenames = [contents], [filenames]
+    # The rules the files are categorized with: write_data applies newer ones to the new rows
+    categories = CONFIG[user]["default_categories"]
+    if len(contents) == 1:
+        frames = [parse_upload(user, contents[0], filenames[0], job, categories)]
+    else:
+        frames = parse_batch(job, user, contents, filenames, categories)
+
+    unsupported = [name for name, frame in zip(filenames, frames) if frame is None]
+    if unsupported:
+        job.publish({"message": f"Formato file non supportato: {', '.join(unsupported)}", "state": None, "timestamp": None})
+        return
+
+    job.advance("persist")
+    st = BankStatement(user, categories)
+    st.data = concat(st.history.with_keys(frame) for frame in frames)
+    st.data = st.data.sort_values(st.headers["date"], kind="stable", ignore_index=True)
+    logger.info("Prepared %d records for the dataset registry.", len(st.data))
+    if not len(st.data):
+        job.publish({"message": f"File '{', '.join(filenames)}' elaborato ma senza righe da salvare.", "state": None, "timestamp": None})
+        return
+
+    # Show the whole history, the upload only contributes its new rows
+    merged, added = st.history.merged(st.data)
+    version = pd.Timestamp.now().strftime('%Y%m%d %H%M%S')
+    dataset = DATASETS.register(user, merged, version)
+    loaded = f"File '{filenames[0]}' caricato" if len(filenames) == 1 else f"{len(filenames)} file caricati"
+    job.publish({
+        "message": f"✅ {loaded} con successo! (righe: {len(st.data)}, nuove: {added})",
+        "state": dataset.state(),
+        "timestamp": version,
+    })
+    try:
+        st.write_data()
+    except Exception as e:
+        # Charts must not keep showing rows that were never saved
+        DATASETS.discard(dataset.key)
+        try:
+            stored = STATEMENTS.get(user)
+        except Exception:
+            logger.exception("Could not reload the stored statement of %s.", user)
+            stored = None
+        job.publish({
+            "message": "Salvataggio non riuscito: nessuna riga è stata salvata.",
+            "state": None if stored is None else stored.state(),
+            "timestamp": None if stored is None else stored.version,
+        })
+        raise RuntimeError(f"salvataggio non riuscito, nessuna riga del file è stata salvata ({e})") from e
+    # Train the category suggestions on the new history now, not when the review page opens
+    try:
+        MODELS.get(user)
+    except Exception:
+        logger.exception("Could not train the category model of %s.", user)
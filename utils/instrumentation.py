@@ -0,0 +1,170 @@
+import cProfile
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+import numpy as np
+from flask import g, jsonify, request
+from utils.paths import app_data_dir
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_PATH = "/_dash-update-component"
+METRICS_PATH = "/_callback-metrics"
+
+
+def _rows(values):
+    """Row count of the first dataset handle (the `app-state` store) among callback values."""
+    for value in values:
+        if isinstance(value, dict) and "rows" in value and "key" in value:
+            return value["rows"]
+    return None
+
+
+class CallbackMetrics:
+    """Wall time, payload sizes and row counts of every Dash callback request.
+
+    The last `window` calls are kept in memory and summarized per callback by
+    `summary()`; each call is also written as a JSON line to a rotating log. With
+    `profile_top` > 0 callbacks run under cProfile and the dumps of the slowest
+    `profile_top` calls are kept in `profiles/`.
+    """
+
+    def __init__(self, app, folder, window=1000, profile_top=0):
+        self.app = app
+        self.calls = deque(maxlen=window)
+        self.profile_top = profile_top
+        self.profile_dir = folder / "profiles"
+        self._slowest = []  # min-heap of (seconds, dump path)
+        self._profiling = threading.Lock()  # cProfile allows one active profiler per process
+        self._lock = threading.Lock()
+
+        self.log = logging.getLogger(f"{__name__}.calls")
+        self.log.propagate = False
+        if not self.log.handlers:
+            folder.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(folder / "callbacks.log", maxBytes=5 * 1024 ** 2, backupCount=3, encoding="utf-8")
+            self.log.addHandler(handler)
+            self.log.setLevel(logging.INFO)
+
+    def _callback_name(self, output):
+        spec = self.app.callback_map.get(output)
+        if spec is None:
+            return output
+        func = spec["callback"]
+        return f"{func.__module__}.{func.__name__}"
+
+    def before(self):
+        if request.path != CALLBACK_PATH:
+            return
+        g.callback_start = time.perf_counter()
+        g.callback_profile = None
+        if self.profile_top and self._profiling.acquire(blocking=False):
+            g.callback_profile = cProfile.Profile()
+            g.callback_profile.enable()
+
+    def after(self, response):
+        start = g.pop("callback_start", None)
+        if start is None:
+            return response
+        profile = g.pop("callback_profile", None)
+        if profile is not None:
+            profile.disable()
+            self._profiling.release()
+        seconds = time.perf_counter() - start
+
+        body = request.get_json(silent=True) or {}
+        output = body.get("output", "")
+        values = [i.get("value") for i in body.get("inputs", []) + body.get("state", []) if isinstance(i, dict)]
+        out_values = []
+        # Only dataset handles carry row counts: don't decode figures and tables for nothing
+        if "app-state.data" in output and response.status_code == 200:
+            response_json = response.get_json(silent=True) or {}
+            out_values = [p for o in response_json.get("response", {}).values() for p in o.values()]
+        call = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "callback": self._callback_name(output),
+            "seconds": round(seconds, 4),
+            "request_bytes": request.content_length or 0,
+            "response_bytes": response.calculate_content_length() or 0,
+            "rows_in": _rows(values),
+            "rows_out": _rows(out_values),
+            "status": response.status_code,
+        }
+        with self._lock:
+            self.calls.append(call)
+        self.log.info(json.dumps(call, ensure_ascii=False))
+        if profile is not None:
+            self._keep_profile(profile, call)
+        return response
+
+    def teardown(self, _exc):
+        # after_request is skipped when a callback raises: don't leave the profiler locked
+        profile = g.pop("callback_profile", None)
+        if profile is not None:
+            profile.disable()
+            self._profiling.release()
+
+    def _keep_profile(self, profile, call):
+        with self._lock:
+            if len(self._slowest) >= self.profile_top and call["seconds"] <= self._slowest[0][0]:
+                return
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            path = self.profile_dir / f"{call['callback'].replace('.', '_')}_{stamp}.prof"
+            profile.dump_stats(path)
+            heapq.heappush(self._slowest, (call["seconds"], str(path)))
+            if len(self._slowest) > self.profile_top:
+                _, evicted = heapq.heappop(self._slowest)
+                Path(evicted).unlink(missing_ok=True)
+
+    def summary(self):
+        """Per-callback count, wall time percentiles and payload sizes of the recorded calls."""
+        with self._lock:
+            calls = list(self.calls)
+            profiles = sorted(self._slowest, reverse=True)
+        by_callback = {}
+        for call in calls:
+            by_callback.setdefault(call["callback"], []).append(call)
+        summary = {}
+        for name, group in by_callback.items():
+            seconds = np.array([c["seconds"] for c in group])
+            summary[name] = {
+                "calls": len(group),
+                "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 1),
+                "p95_ms": round(float(np.percentile(seconds, 95)) * 1000, 1),
+                "max_ms": round(float(seconds.max()) * 1000, 1),
+                "mean_request_bytes": int(np.mean([c["request_bytes"] for c in group])),
+                "mean_response_bytes": int(np.mean([c["response_bytes"] for c in group])),
+                "max_response_bytes": max(c["response_bytes"] for c in group),
+            }
+        return {
+            "callbacks": dict(sorted(summary.items(), key=lambda item: -item[1]["p95_ms"])),
+            "recent": calls[-50:],
+            "slowest_profiles": [{"seconds": s, "path": p} for s, p in profiles],
+        }
+
+
+def instrument(app, window=1000, profile_top=0):
+    """Record every callback request of `app` and serve the summary at METRICS_PATH.
+
+    The endpoint only answers requests from the local machine.
+    """
+    metrics = CallbackMetrics(app, app_data_dir(), window, profile_top)
+    app.server.before_request(metrics.before)
+    app.server.after_request(metrics.after)
+    app.server.teardown_request(metrics.teardown)
+
+    @app.server.route(METRICS_PATH)
+    def callback_metrics():
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            return "Not found", 404
+        return jsonify(metrics.summary())
+
+    logger.info("Callback instrumentation enabled (log in %s).", app_data_dir() / "callbacks.log")
+    return metrics
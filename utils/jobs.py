@@ -0,0 +1,108 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from utils.lru import BoundedLRU
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """Progress, result and cancellation flag of one background job."""
+
+    def __init__(self, stages):
+        self.id = uuid.uuid4().hex
+        self.stages = stages
+        self.stage = None
+        self.detail = None
+        self.status = "queued"  # queued, running, done, error, cancelled
+        self.message = None
+        self.result = None
+        self._result_taken = False
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def advance(self, stage):
+        """Enter `stage`; raises JobCancelled if a cancel was requested meanwhile."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.stage = stage
+        self.detail = None
+        logger.info("Job %s: %s", self.id, stage)
+
+    def report(self, detail):
+        """Update the detail of the current stage (e.g. '3/12'); also honours cancels."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.detail = detail
+
+    def progress(self):
+        """Share of stages completed, between 0 and 1."""
+        if self.status == "done":
+            return 1.0
+        if self.stage is None:
+            return 0.0
+        return self.stages.index(self.stage) / len(self.stages)
+
+    def publish(self, result):
+        """Make the result available while the job keeps running (e.g. persisting).
+
+        A later publish replaces the result, which can then be taken again.
+        """
+        with self._lock:
+            self.result = result
+            self._result_taken = False
+
+    def take_result(self):
+        """Return the published result once; None afterwards or if not ready."""
+        with self._lock:
+            if self.result is None or self._result_taken:
+                return None
+            self._result_taken = True
+            return self.result
+
+    def cancel(self):
+        self._cancel.set()
+
+
+class JobManager:
+    """Runs jobs on a small thread pool, in the server process.
+
+    Threads (rather than worker processes) keep jobs next to the dataset registry,
+    so a finished job can hand over its DataFrame without serializing it.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=32):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = BoundedLRU(max_jobs)
+
+    def submit(self, stages, func, *args):
+        """Run `func(job, *args)` in the background and return the Job."""
+        job = Job(stages)
+        self._jobs.put(job.id, job)
+        self._executor.submit(self._run, job, func, *args)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    @staticmethod
+    def _run(job, func, *args):
+        job.status = "running"
+        try:
+            func(job, *args)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+            logger.info("Job %s cancelled.", job.id)
+        except Exception as e:
+            job.status = "error"
+            job.message = str(e)
+            logger.exception("Job %s failed: %s", job.id, e)
+
+
+JOBS = JobManager()
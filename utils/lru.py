@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+
+class BoundedLRU:
+    """Thread-safe least-recently-used map, bounded in entries and optionally in total size.
+
+    `size(value)` weighs each entry against `max_bytes` when it is stored. The most
+    recently stored entry is never evicted, even if it alone exceeds `max_bytes`.
+    Methods that remove entries return them as (key, value) pairs, so callers can log
+    them or release what they hold (e.g. delete a file) outside the lock.
+    """
+
+    def __init__(self, max_entries, max_bytes=None, size=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._size = size or (lambda value: 0)
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Value of `key`, marked as the most recently used; `default` when missing."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        """Store `value` as the most recently used entry; returns the evicted entries."""
+        size = self._size(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total -= previous[1]
+            self._entries[key] = (value, size)
+            self._total += size
+            evicted = []
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._total > self.max_bytes)
+            ):
+                old_key, (old_value, old_size) = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append((old_key, old_value))
+        return evicted
+
+    def discard(self, key):
+        """Remove `key`; returns its value, None when missing."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._total -= entry[1]
+            return entry[0]
+
+    def discard_where(self, predicate):
+        """Remove the entries for which `predicate(key, value)` is true; returns them."""
+        with self._lock:
+            removed = [(k, v) for k, (v, _) in self._entries.items() if predicate(k, v)]
+            for k, _ in removed:
+                self._total -= self._entries.pop(k)[1]
+        return removed
+
+    def values(self):
+        with self._lock:
+            return [value for value, _ in self._entries.values()]
+
+    def total_size(self):
+        with self._lock:
+            return self._total
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        """Remove every entry; returns them."""
+        with self._lock:
+            removed = [(k, v) for k, (v, _) in self._entries.items()]
+            self._entries.clear()
+            self._total = 0
+        return removed
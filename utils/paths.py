@@ -1,5 +1,6 @@
 import sys
 import os
+from pathlib import Path
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -12,3 +13,9 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
     return os.path.join(base_path, relative_path)
+
+def app_data_dir():
+    """ Per-user folder of the app: %APPDATA%/BankStatementApp on Windows, ~/.bankstatementapp elsewhere """
+    if sys.platform == "win32":
+        return Path(os.getenv('APPDATA')) / "BankStatementApp"
+    return Path.home() / ".bankstatementapp"
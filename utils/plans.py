@@ -0,0 +1,132 @@
+import json
+import logging
+import re
+import threading
+import pandas as pd
+from utils.config import CONFIG
+from utils.paths import app_data_dir
+from utils.reader import file_kind, sniff_csv, sniff_xlsx
+from utils.storage import file_lock, write_json
+
+logger = logging.getLogger(__name__)
+
+# Tried in order on the distinct dates of a statement without a plan
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%d/%m/%y", "%Y/%m/%d")
+
+
+def detect_date_format(dates):
+    """First of DATE_FORMATS parsing every distinct date, None for datetime columns or no match."""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return None
+    uniques = pd.Index(pd.unique(dates.dropna())).astype(str)
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(uniques, format=date_format, errors="coerce").notna().all():
+            return date_format
+    return None
+
+
+def detect_separators(values):
+    """(decimal, thousands) separators of amounts written as text, (None, None) for numeric columns.
+
+    A comma means a decimal comma and dots as thousands separators, otherwise the dot is decimal.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return None, None
+    text = values.dropna().astype(str)
+    if text.str.contains(",", regex=False).any():
+        return ",", "." if text.str.contains(".", regex=False).any() else None
+    return ".", None
+
+
+def build_plan(raw, kind, headers, frame):
+    """Parse plan of a statement read by utils.reader: its layout and how its text is typed.
+
+    `frame` is the reader's output, before process_statement types it.
+    """
+    plan = {"kind": kind}
+    plan.update(sniff_csv(raw, headers) if kind == "csv" else sniff_xlsx(raw, headers))
+    plan["decimal"], plan["thousands"] = detect_separators(frame[headers["value"]])
+    plan["date_format"] = detect_date_format(frame[headers["date"]])
+    return plan
+
+
+class ParsePlans:
+    """Parse plans of every owner, keyed by its `sourcedoc_namepattern` and the file kind.
+
+    Plans are learned from the first file of a kind whose name matches the owner's pattern
+    and stored in `parse_plans.json` of the app data folder, written atomically under a
+    lock file shared with the batch upload workers. An owner's
+    `parse_plans` entry in config.json ({kind: plan}) is used when nothing was learned yet,
+    so a new bank layout can be declared without code.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._plans = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = app_data_dir() / "parse_plans.json"
+        return self._path
+
+    def _load(self, fresh=False):
+        # Worker processes of batch uploads store plans too: reload when the file changed
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if fresh or self._plans is None or mtime != self._mtime:
+            try:
+                self._plans = json.loads(self.path.read_text(encoding="utf-8")) if mtime is not None else {}
+            except ValueError:
+                logger.warning("Unreadable parse plans in %s: starting over.", self.path)
+                self._plans = {}
+            self._mtime = mtime
+        return self._plans
+
+    @staticmethod
+    def _pattern(owner, filename):
+        """The owner's file name pattern if `filename` matches it, else None."""
+        pattern = CONFIG[owner].get("sourcedoc_namepattern")
+        if pattern and re.search(pattern, filename or ""):
+            return pattern
+        return None
+
+    def lookup(self, owner, filename, content_type=""):
+        """Plan for the upload `filename` of `owner`, or None."""
+        kind = file_kind(filename, content_type)
+        pattern = self._pattern(owner, filename)
+        if kind not in ("csv", "xlsx") or pattern is None:
+            return None
+        with self._lock:
+            plan = self._load().get(owner, {}).get(pattern, {}).get(kind)
+        return plan or CONFIG[owner].get("parse_plans", {}).get(kind)
+
+    def detect(self, owner, filename, content_type, raw, frame):
+        """Plan of an upload read without one, None when its name does not match the owner's pattern.
+
+        Not stored: the caller stores it once the statement has been processed with it.
+        """
+        kind = file_kind(filename, content_type)
+        if kind not in ("csv", "xlsx") or self._pattern(owner, filename) is None:
+            return None
+        return build_plan(raw, kind, CONFIG[owner]["headers"], frame)
+
+    def store(self, owner, filename, plan):
+        """Remember `plan` for the files of `owner` matching the pattern `filename` matches."""
+        pattern = self._pattern(owner, filename)
+        if pattern is None:
+            return
+        # Read, update and write under the file lock, so processes storing at once keep each other's plans
+        with self._lock, file_lock(self.path.with_name(".parse_plans.lock")):
+            plans = self._load(fresh=True)
+            plans.setdefault(owner, {}).setdefault(pattern, {})[plan["kind"]] = plan
+            write_json(self.path, plans)
+            self._mtime = self.path.stat().st_mtime_ns
+        logger.info("Parse plan stored for %s (%s, %s).", owner, pattern, plan["kind"])
+
+
+PLANS = ParsePlans()
@@ -0,0 +1,207 @@
+import csv
+import io
+import logging
+from itertools import chain, islice
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Area scanned for the header identifier, same as BankStatement.process_statement
+SNIFF_ROWS, SNIFF_COLS = 10, 10
+# Tried in order when a CSV statement is read without a parse plan
+ENCODINGS = ("utf-8-sig", "cp1252")
+DELIMITERS = (",", ";", "\t")
+XLSX_CHUNK_ROWS = 4096  # Rows of xlsx cells held as Python objects at a time
+
+
+class PlanMismatch(ValueError):
+    """A file does not have the layout its parse plan expects."""
+
+
+def locate_header(rows, flag):
+    """Return (row, column) of `flag` within the first SNIFF_ROWS x SNIFF_COLS cells."""
+    for row_index, row in enumerate(rows[:SNIFF_ROWS]):
+        for col_index, value in enumerate(row[:SNIFF_COLS]):
+            if value == flag:
+                return row_index, col_index
+    raise ValueError("Unidentifiable headers.")
+
+
+def _header_names(header_row, col_index):
+    """Positions and names of the named columns from the identifier onwards."""
+    return [
+        (position, name) for position, name in enumerate(header_row)
+        if position >= col_index and name not in (None, "")
+    ]
+
+
+def _csv_rows(raw, encoding, delimiter):
+    return csv.reader(io.TextIOWrapper(io.BytesIO(raw), encoding=encoding, newline=""), delimiter=delimiter)
+
+
+def sniff_csv(raw, headers):
+    """Encoding, delimiter, header row and named columns of a CSV statement.
+
+    Every encoding and delimiter of ENCODINGS and DELIMITERS is tried on the first
+    SNIFF_ROWS rows until the identifier is found.
+    """
+    for encoding in ENCODINGS:
+        for delimiter in DELIMITERS:
+            try:
+                sniffed = list(islice(_csv_rows(raw, encoding, delimiter), SNIFF_ROWS))
+                row_index, col_index = locate_header(sniffed, headers["loc_identif"])
+            except (UnicodeDecodeError, ValueError):
+                continue
+            return {
+                "encoding": encoding, "delimiter": delimiter,
+                "header_row": row_index, "columns": _header_names(sniffed[row_index], col_index),
+            }
+    raise ValueError("Unidentifiable headers.")
+
+
+def check_header(row, plan):
+    """Raise PlanMismatch unless `row` has the column names of `plan` at their positions."""
+    if any(position >= len(row) or row[position] != name for position, name in plan["columns"]):
+        raise PlanMismatch(f"Header row {plan['header_row']} differs from the parse plan.")
+
+
+def read_csv_statement(raw, headers, plan=None):
+    """Two-phase CSV reader working directly on the uploaded bytes.
+
+    The first rows are sniffed with the csv module to find the encoding, delimiter,
+    header row and column offset, then pandas parses the body once, only for the named
+    columns and with every column as text (dates and amounts are typed by process_statement).
+    With a parse plan only its header row is read back and checked, and amounts are
+    parsed as numbers with the plan's separators; PlanMismatch is raised when the file
+    does not fit the plan.
+    """
+    if plan is None:
+        layout = sniff_csv(raw, headers)
+    else:
+        layout = plan
+        try:
+            row = next(islice(_csv_rows(raw, plan["encoding"], plan["delimiter"]), plan["header_row"], None), [])
+        except UnicodeDecodeError as e:
+            raise PlanMismatch(str(e)) from e
+        check_header(row, plan)
+
+    positions = [position for position, _ in layout["columns"]]
+    dtype = str
+    separators = {}
+    if plan is not None and plan.get("decimal"):
+        dtype = {position: (float if name == headers["value"] else str) for position, name in layout["columns"]}
+        separators = {"decimal": plan["decimal"], "thousands": plan.get("thousands")}
+    try:
+        return pd.read_csv(
+            io.BytesIO(raw),
+            header=None,
+            skiprows=layout["header_row"] + 1,
+            usecols=positions,
+            dtype=dtype,
+            encoding=layout["encoding"],
+            sep=layout["delimiter"],
+            skip_blank_lines=True,
+            **separators,
+        ).set_axis([name for _, name in layout["columns"]], axis=1)
+    except (ValueError, UnicodeDecodeError) as e:
+        if plan is None:
+            raise
+        raise PlanMismatch(str(e)) from e
+
+
+def read_xlsx_statement(raw, headers, plan=None):
+    """Stream the first worksheet with openpyxl in read-only mode.
+
+    Rows before the header and columns before the identifier are never materialized.
+    With a parse plan the header row is taken from the plan and checked.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(raw), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        if plan is None:
+            sniffed = list(islice(rows, SNIFF_ROWS))
+            row_index, col_index = locate_header(sniffed, headers["loc_identif"])
+            columns = _header_names(sniffed[row_index], col_index)
+        else:
+            sniffed = list(islice(rows, plan["header_row"] + 1))
+            row_index, columns = plan["header_row"], plan["columns"]
+            check_header(sniffed[row_index] if len(sniffed) > row_index else (), plan)
+        return _xlsx_columns(chain(sniffed[row_index + 1:], rows), columns)
+    finally:
+        workbook.close()
+
+
+def _xlsx_columns(rows, columns):
+    """Frame of the `columns` cells of `rows`, skipping empty rows, built column by column.
+
+    Cells are held as Python objects for XLSX_CHUNK_ROWS rows at a time only: each chunk
+    of a column becomes a typed Series (Arrow strings, float64, datetime64) right away.
+    """
+    positions = [position for position, _ in columns]
+    pending = [[] for _ in columns]
+    chunks = [[] for _ in columns]
+
+    def flush():
+        for chunk, values in zip(chunks, pending):
+            chunk.append(pd.Series(values))
+            values.clear()
+
+    for row in rows:
+        values = [row[p] if p < len(row) else None for p in positions]
+        if any(v is not None for v in values):
+            for column, value in zip(pending, values):
+                column.append(value)
+            if len(pending[0]) >= XLSX_CHUNK_ROWS:
+                flush()
+    flush()
+    frame = {}
+    for i, chunk in enumerate(chunks):
+        column = pd.concat(chunk, ignore_index=True)
+        # Chunks typed differently (e.g. one with empty cells only) concatenate as objects
+        frame[i] = column.infer_objects() if column.dtype == object else column
+    return pd.DataFrame(frame).set_axis([name for _, name in columns], axis=1)
+
+
+def sniff_xlsx(raw, headers):
+    """Header row and named columns of the first worksheet of an xlsx statement."""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(raw), read_only=True, data_only=True)
+    try:
+        sniffed = list(islice(workbook.worksheets[0].iter_rows(values_only=True), SNIFF_ROWS))
+    finally:
+        workbook.close()
+    row_index, col_index = locate_header(sniffed, headers["loc_identif"])
+    return {"header_row": row_index, "columns": _header_names(sniffed[row_index], col_index)}
+
+
+def file_kind(filename, content_type):
+    """'csv', 'xlsx' or 'xls' from the name or content type of an upload, None if unsupported."""
+    name = (filename or "").lower()
+    if name.endswith('.csv') or 'csv' in content_type:
+        return "csv"
+    if name.endswith('.xlsx'):
+        return "xlsx"
+    if name.endswith('.xls') or 'excel' in content_type:
+        return "xls"
+    return None
+
+
+def read_statement(raw, filename, content_type, headers, plan=None):
+    """Parse an uploaded statement into a frame with its header row applied.
+
+    Returns None for unsupported file types. Legacy .xls files fall back to a full
+    pandas read, which process_statement then slices. `plan` is a parse plan of the
+    file's kind (see utils.plans); PlanMismatch is raised when the file does not fit it.
+    """
+    kind = file_kind(filename, content_type)
+    if kind == "csv":
+        return read_csv_statement(raw, headers, plan)
+    if kind == "xlsx":
+        return read_xlsx_statement(raw, headers, plan)
+    if kind == "xls":
+        return pd.read_excel(io.BytesIO(raw), header=None)
+    logger.warning("Unsupported file type: %s (%s)", filename, content_type)
+    return None
@@ -0,0 +1,125 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from utils.aggregates import move_rows
+from utils.categorizer import UNCATEGORIZED, compile_keywords, distinct_descriptions, get_categorizer
+from utils.config import CONFIG, save_config
+from utils.datasets import DATASETS
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()  # One rule change at a time: each one reads the result of the previous
+
+
+def _keywords(categories):
+    return {(name, k.lower()) for name, keywords in categories.items() for k in keywords}
+
+
+def changed_keywords(old, new):
+    """Keywords whose matches may change category between two rule sets, or None for all rows.
+
+    A keyword added to or removed from a category only affects the descriptions containing
+    it. Reordering categories changes which one wins for descriptions matching several of
+    them, so then every row has to be evaluated again.
+    """
+    common = [name for name in old if name in new]
+    if common != [name for name in new if name in old]:
+        return None
+    return {keyword for _, keyword in _keywords(old) ^ _keywords(new)}
+
+
+def affected(descriptions, categories, keywords):
+    """Mask of the rows to evaluate again: Uncategorized ones and those containing `keywords`."""
+    mask = (categories == UNCATEGORIZED).to_numpy(bool, na_value=False)
+    if keywords:
+        codes, lowered = distinct_descriptions(descriptions)
+        mask = mask | lowered.str.contains(compile_keywords(keywords), regex=True).to_numpy(bool)[codes]
+    return mask
+
+
+def recategorize(frame, headers, old, new):
+    """Categories of `frame` under the `new` rules, evaluated only where they may differ from `old`.
+
+    Returns the updated frame (None when no row changes category), the positions of the rows
+    that moved and their previous categories.
+    """
+    description_col, category_col = headers.get("descript", "Descrizione"), headers.get("category", "Categoria")
+    current = frame[category_col]
+    keywords = changed_keywords(old, new)
+    candidates = np.ones(len(frame), dtype=bool) if keywords is None else affected(frame[description_col], current, keywords)
+    positions = np.flatnonzero(candidates)
+    if not len(positions):
+        return None, positions, None
+    values = get_categorizer(new).categorize(frame[description_col].iloc[positions]).to_numpy(object)
+    previous = current.iloc[positions].astype(object).to_numpy()
+    moved = values != previous
+    positions, values, previous = positions[moved], values[moved], previous[moved]
+    if not len(positions):
+        return None, positions, None
+    # Swap the codes of the moved rows only, the other rows keep theirs
+    current = current.astype("category")
+    names = current.cat.categories.union(pd.Index(np.unique(values.astype(str))))
+    codes = current.cat.set_categories(names).cat.codes.to_numpy(copy=True)
+    codes[positions] = names.get_indexer(values)
+    categories = pd.Categorical.from_codes(codes, names).remove_unused_categories()
+    return frame.assign(**{category_col: categories}), positions, previous
+
+
+def update_rules(owner, categories):
+    """Save the `categories` rules of `owner` and re-categorize the affected rows everywhere.
+
+    `categories` must be a new dict, not the one in CONFIG edited in place. The stored
+    history is rewritten first, only if some row changes category, and the rules are
+    switched in CONFIG under the history lock, so uploads appending meanwhile categorize
+    their new rows with them (see BankStatement.write_data). The rules are then written
+    to config.json atomically; if that fails, the history is re-categorized back under
+    the previous rules, so config.json and the history always agree.
+    Every registered dataset of the owner is replaced by a new version with the moved
+    rows and an incrementally updated cube.
+    Returns {dataset key: new Dataset} of the datasets that changed.
+    """
+    from utils.bankstatement import BankStatement
+
+    with _lock:
+        old = CONFIG[owner]["default_categories"]
+        headers = CONFIG[owner]["headers"]
+        history = BankStatement(owner, categories).history
+        moved_rows = {}
+
+        def switch(previous, rules):
+            def update(frame):
+                # Under the history lock: appends wait for the new rules
+                CONFIG[owner]["default_categories"] = rules
+                # An empty history has no columns at all
+                if frame.empty or headers.get("category", "Categoria") not in frame.columns:
+                    return None
+                updated, positions, _ = recategorize(frame, headers, previous, rules)
+                moved_rows["history"] = len(positions)
+                return updated
+            return update
+
+        try:
+            history.rewrite(switch(old, categories))
+        except Exception:
+            CONFIG[owner]["default_categories"] = old
+            raise
+        try:
+            save_config()
+        except Exception:
+            logger.exception("Could not save the rules of %s: restoring the previous ones.", owner)
+            history.rewrite(switch(categories, old))
+            raise
+
+        version = pd.Timestamp.now().strftime('%Y%m%d %H%M%S %f')
+        changed = {}
+        for dataset in DATASETS.owned_by(owner):
+            frame, positions, previous = recategorize(dataset.frame, headers, old, categories)
+            if frame is None:
+                continue
+            # Moving a large share of the rows costs more than aggregating them all again
+            cube = move_rows(dataset.cube, frame.iloc[positions], previous, headers) if len(positions) * 8 < len(frame) else None
+            changed[dataset.key] = DATASETS.register(owner, frame, version, key=dataset.key, cube=cube)
+    logger.info("Rules of %s updated: %d stored rows and %d datasets re-categorized.",
+                owner, moved_rows.get("history", 0), len(changed))
+    return changed
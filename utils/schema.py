@@ -0,0 +1,103 @@
+import datetime
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Text columns with at most this share of distinct values are stored as categoricals
+LOW_CARDINALITY_RATIO = 0.5
+TEXT_DATE_FORMAT = "%d/%m/%Y"  # Dates in text columns, written as the banks' CSV exports do
+
+
+def _is_text(values):
+    """True for `str` columns and object columns holding nothing but strings."""
+    if values.dtype == object:
+        return pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty")
+    return pd.api.types.is_string_dtype(values.dtype)
+
+
+def _date_text(value):
+    if isinstance(value, datetime.date) and not pd.isna(value):
+        timed = isinstance(value, datetime.datetime) and value.time() != datetime.time()
+        return value.strftime(TEXT_DATE_FORMAT + (" %H:%M:%S" if timed else ""))
+    return value
+
+
+def as_text(values):
+    """`values` as the Arrow-backed `str` dtype, missing values kept.
+
+    Typed cells (dates and numbers from xlsx files) become the text a CSV export of the
+    same statement holds, so a column has one dtype whichever file type it came from.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    if pd.api.types.is_datetime64_any_dtype(values) or (values.dtype == object and not _is_text(values)):
+        values = values.astype(object).map(_date_text)
+    return values.astype("str")
+
+
+def compact(frame, headers):
+    """Canonical in-memory dtypes of a categorized statement, applied in place.
+
+    Dates datetime64, amounts float64 and every other column text, whatever the file
+    type: the category column and every repetitive text column (details, value dates,
+    short descriptions...) categorical, other text the Arrow-backed `str` dtype.
+    Logs and returns the bytes saved.
+    """
+    before = int(frame.memory_usage(deep=True).sum())
+    date_col, value_col, category_col = headers["date"], headers["value"], headers.get("category", "Categoria")
+    for col in frame.columns:
+        values = frame[col]
+        if col == date_col:
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                frame[col] = pd.to_datetime(values, errors="coerce")
+        elif col == value_col:
+            frame[col] = pd.to_numeric(values, errors="coerce").astype("float64")
+        elif isinstance(values.dtype, pd.CategoricalDtype) and _is_text(values.cat.categories.to_series()):
+            continue
+        else:
+            values = as_text(values)
+            if col == category_col or values.nunique() <= LOW_CARDINALITY_RATIO * len(values):
+                values = values.astype("category")
+            frame[col] = values
+    after = int(frame.memory_usage(deep=True).sum())
+    if before:
+        logger.info("Compact dtypes: %.1f MB -> %.1f MB (%d%% saved).",
+                    before / 1024 ** 2, after / 1024 ** 2, round(100 * (before - after) / before))
+    return before - after
+
+
+def column_types(frame):
+    """DataTable type ('datetime', 'numeric' or 'text') of every column, read off the dtypes.
+
+    Statements get their canonical dtypes when they are parsed (`process_statement`,
+    `compact`) and keep them in the history, so no value needs to be parsed here.
+    """
+    types = {}
+    for col, dtype in frame.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            types[col] = "datetime"
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            types[col] = "numeric"
+        else:
+            types[col] = "text"
+    return types
+
+
+def concat(frames):
+    """pd.concat keeping categorical columns categorical even when their categories differ.
+
+    Columns whose dtype differs between the frames (e.g. parts stored before `compact`
+    made every column text) come out of pd.concat as mixed objects, which Parquet cannot
+    store: they are turned into text with `as_text`.
+    """
+    frames = list(frames)
+    categorical = {c for f in frames for c, t in f.dtypes.items() if isinstance(t, pd.CategoricalDtype)}
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    for col in frame.columns[(frame.dtypes == object).to_numpy()]:
+        if not _is_text(frame[col]):
+            frame[col] = as_text(frame[col])
+    for col in categorical & set(frame.columns):
+        if not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype("category")
+    return frame
@@ -0,0 +1,35 @@
+import json
+import logging
+import time
+from datetime import datetime
+from utils.paths import app_data_dir
+
+logger = logging.getLogger(__name__)
+
+# Startup stages in the order they complete, with the seconds each one took
+_start = _last = time.perf_counter()
+_started = datetime.now()
+TIMINGS = {}
+
+
+def mark(stage):
+    """Record the time elapsed since the previous stage (or since this module was imported)."""
+    global _last
+    now = time.perf_counter()
+    TIMINGS[stage] = round(now - _last, 3)
+    _last = now
+
+
+def write_report(filename="startup.jsonl"):
+    """Append the breakdown to a JSON-lines file in the app folder, one line per start."""
+    record = {
+        "started": _started.isoformat(timespec="seconds"),
+        **TIMINGS,
+        "total": round(_last - _start, 3),
+    }
+    logger.info("Startup: %s", record)
+    path = app_data_dir() / filename
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    return record
@@ -0,0 +1,85 @@
+import logging
+import threading
+from utils.datasets import DATASETS
+from utils.history import LEGACY_MARKER, MANIFEST
+from utils.paths import app_data_dir
+
+logger = logging.getLogger(__name__)
+
+
+def _signature(owner):
+    """What a stored statement depends on: the owner's history manifest, and the data folder
+    until its legacy snapshots are imported.
+
+    Every change to the history replaces its manifest, so the manifest's modification time
+    and size stand for all its parts; the data folder's own mtime changes when legacy
+    snapshots to import are dropped into it, which only matters before LEGACY_MARKER exists.
+    """
+    data_dir = app_data_dir() / "data"
+    history_dir = data_dir / "history" / owner
+    paths = [history_dir / MANIFEST]
+    if not (history_dir / LEGACY_MARKER).exists():
+        paths.append(data_dir)
+    signature = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class StatementCache:
+    """Last stored statement of every owner, kept registered as a dataset.
+
+    An entry stays valid while the owner's files are unchanged and its dataset is still
+    in DATASETS, so switching owner costs a few stat calls and a dictionary lookup
+    instead of loading the history and building its aggregates again.
+    """
+
+    def __init__(self):
+        self._entries = {}  # owner -> (signature, dataset key or None when nothing is stored)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _owner_lock(self, owner):
+        with self._lock:
+            return self._locks.setdefault(owner, threading.Lock())
+
+    def get(self, owner):
+        """Dataset of the owner's stored history, or None when nothing is stored."""
+        from utils.bankstatement import BankStatement
+
+        # Per owner: a user switch during the warm-up waits for that load instead of repeating it
+        with self._owner_lock(owner):
+            entry = self._entries.get(owner)
+            if entry is not None and entry[0] == _signature(owner):
+                if entry[1] is None:
+                    return None
+                dataset = DATASETS.get(entry[1])
+                if dataset is not None:
+                    return dataset
+            last = BankStatement(owner).load_last_available_statement()
+            dataset = None
+            if last["data"] is not None:
+                dataset = DATASETS.register(owner, last["data"], last["time_saved"])
+            # Signed after loading, which may create folders or import legacy snapshots
+            self._entries[owner] = (_signature(owner), None if dataset is None else dataset.key)
+            return dataset
+
+    def warm(self, owners):
+        for owner in owners:
+            try:
+                self.get(owner)
+            except Exception:
+                logger.exception("Could not preload the statement of %s.", owner)
+        logger.info("Statements of %d owners preloaded.", len(owners))
+
+    def warm_in_background(self, owners):
+        thread = threading.Thread(target=self.warm, args=(list(owners),), name="statement-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+STATEMENTS = StatementCache()
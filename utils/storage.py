@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+def version_id():
+    """Unique, chronologically sortable id: 'YYYYmmdd_HHMMSS_ffffff_<8 hex>'.
+
+    The random suffix keeps ids of writes in the same microsecond, or from different
+    processes, apart.
+    """
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:8]}"
+
+
+@contextmanager
+def replacing(path):
+    """Temporary path next to `path`, renamed over it when the block succeeds.
+
+    Readers see either the old file or the complete new one, never a partial write.
+    Temporary files start with '.' and end with '.tmp', see `is_temporary`.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield Path(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def is_temporary(name):
+    return name.startswith(".") and name.endswith(".tmp")
+
+
+def write_json(path, data):
+    """Write `data` to `path` atomically, synced to disk before the rename."""
+    with replacing(path) as tmp:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on the file `path` (created if missing), shared by every process.
+
+    Blocks until the lock is free. Uses flock on POSIX and msvcrt on Windows, where
+    locking retries for about 10 seconds before raising OSError.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
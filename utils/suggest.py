@@ -0,0 +1,154 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from utils.categorizer import UNCATEGORIZED
+from utils.config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+FEATURE_BITS = 17
+N_FEATURES = 2 ** FEATURE_BITS  # Hashed n-gram space: a few MB of centroids per owner
+NGRAM_SIZES = (3, 4)
+MIN_EXAMPLES = 20  # Distinct categorized descriptions needed to train a model
+MIN_CONFIDENCE = 0.2  # Suggestions less similar than this to their category are dropped
+
+
+def _normalize(descriptions):
+    """Codes of `descriptions` (-1 when missing) and their distinct values, normalized.
+
+    Dates, amounts and card numbers say nothing about the category, so every digit becomes 0.
+    """
+    codes, uniques = pd.factorize(pd.Series(descriptions))
+    texts = pd.Series(uniques, dtype=object).astype(str).str.lower().str.replace(r"\d", "0", regex=True)
+    # Descriptions differing only by their digits are scored once
+    folded, texts = pd.factorize(texts)
+    return np.append(folded, -1)[codes], list(texts)
+
+
+def _term_counts(texts):
+    """Hashed character n-grams of `texts`: (text index, feature, count) of every distinct pair.
+
+    All texts are encoded into one array of code points and hashed together, so the cost
+    is a few numpy passes over the total length instead of a loop over the texts.
+    """
+    padded = [f" {t} " for t in texts]
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    text_of = np.repeat(np.arange(len(padded), dtype=np.int64), lengths)
+    keys = []
+    for n in NGRAM_SIZES:
+        m = len(codes) - n + 1
+        if m <= 0:
+            continue
+        hashed = np.full(m, n, dtype=np.uint64)
+        for k in range(n):
+            hashed = (hashed * np.uint64(1000003)) ^ codes[k:k + m]
+        # Keep the n-grams lying inside one text; the top bits of a last multiplication are the feature
+        inside = text_of[:m] == text_of[n - 1:]
+        features = ((hashed[inside] * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - FEATURE_BITS)).astype(np.int64)
+        keys.append(text_of[:m][inside] * N_FEATURES + features)
+    keys, counts = np.unique(np.concatenate(keys) if keys else np.empty(0, dtype=np.int64), return_counts=True)
+    return keys // N_FEATURES, keys % N_FEATURES, counts
+
+
+def _vectors(texts, idf):
+    """Sparse L2-normalized tf-idf vectors of `texts` as (text index, feature, weight) arrays."""
+    docs, features, counts = _term_counts(texts)
+    weights = (1 + np.log(counts)) * idf[features]
+    norms = np.sqrt(np.bincount(docs, weights ** 2, minlength=len(texts)))
+    return docs, features, weights / np.where(norms > 0, norms, 1)[docs]
+
+
+class CategoryModel:
+    """Nearest-centroid classifier over character n-grams of the descriptions.
+
+    Each category is the normalized sum of the tf-idf vectors of its distinct descriptions;
+    a description is scored against every category by cosine similarity, which is also
+    the confidence of the suggestion.
+    """
+
+    def __init__(self, descriptions, categories):
+        codes, texts = _normalize(descriptions)
+        examples = pd.DataFrame({
+            "text": np.append(np.array(texts, dtype=object), None)[codes],
+            "category": categories.astype(str).to_numpy(),
+        })
+        examples = examples[examples["text"].notna() & (examples["category"] != UNCATEGORIZED)].drop_duplicates()
+        self.names = np.array(sorted(examples["category"].unique()), dtype=object)
+        self.examples = len(examples)
+        texts = examples["text"].tolist()
+        labels = np.searchsorted(self.names, examples["category"].to_numpy())
+
+        docs, features, _ = _term_counts(texts)
+        document_frequency = np.bincount(features, minlength=N_FEATURES)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        docs, features, weights = _vectors(texts, self.idf)
+        centroids = np.bincount(
+            labels[docs] * N_FEATURES + features, weights, minlength=len(self.names) * N_FEATURES
+        ).reshape(len(self.names), N_FEATURES)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = (centroids / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+    def predict(self, descriptions):
+        """DataFrame of the best category and its confidence (0-1) for every description.
+
+        Distinct descriptions are scored once, in one batch.
+        """
+        descriptions = pd.Series(descriptions)
+        codes, texts = _normalize(descriptions)
+        docs, features, weights = _vectors(texts, self.idf)
+        scores = np.empty((len(texts), len(self.names)), dtype=np.float32)
+        for i, centroid in enumerate(self.centroids):
+            scores[:, i] = np.bincount(docs, centroid[features] * weights, minlength=len(texts))
+        best = scores.argmax(axis=1) if len(texts) else np.empty(0, dtype=np.int64)
+        confidence = scores[np.arange(len(texts)), best]
+        # Missing descriptions (code -1) get no suggestion
+        category = np.append(self.names[best], None)[codes]
+        confidence = np.append(confidence, 0.0)[codes]
+        return pd.DataFrame({"category": category, "confidence": confidence}, index=descriptions.index)
+
+
+class ModelCache:
+    """Category model of every owner, trained on its history and retrained when the history changes."""
+
+    def __init__(self):
+        self._entries = {}  # owner -> (history parts, CategoryModel or None)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, owner):
+        """Model of `owner`, or None when its history has too few categorized descriptions."""
+        from utils.bankstatement import BankStatement
+
+        history = BankStatement(owner).history
+        with self._lock:
+            lock = self._locks.setdefault(owner, threading.Lock())
+        with lock:
+            parts = history.parts()
+            entry = self._entries.get(owner)
+            if entry is not None and entry[0] == parts:
+                return entry[1]
+            headers = CONFIG[owner]["headers"]
+            frame = history.load()
+            model = None
+            if not frame.empty:
+                model = CategoryModel(frame[headers["descript"]], frame[headers["category"]])
+                if model.examples < MIN_EXAMPLES or len(model.names) < 2:
+                    model = None
+            self._entries[owner] = (parts, model)
+            logger.info("Category model of %s: %s.", owner,
+                        "not enough examples" if model is None else f"{model.examples} examples, {len(model.names)} categories")
+            return model
+
+    def suggest(self, owner, descriptions):
+        """Suggested category and confidence of `descriptions`, None below MIN_CONFIDENCE or without a model."""
+        model = self.get(owner)
+        if model is None:
+            return None
+        suggestions = model.predict(descriptions)
+        suggestions.loc[suggestions["confidence"] < MIN_CONFIDENCE, "category"] = None
+        return suggestions
+
+
+MODELS = ModelCache()
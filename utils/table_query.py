@@ -0,0 +1,148 @@
+import re
+import numpy as np
+import pandas as pd
+from utils.lru import BoundedLRU
+
+# DataTable filter grammar (see the Dash DataTable "filtering syntax" docs): relational operators
+# by symbol or name, optionally prefixed with i (case-insensitive) or s (case-sensitive), and
+# unary `is ...` tests
+SYMBOLS = {'>=': 'ge', '<=': 'le', '!=': 'ne', '<': 'lt', '>': 'gt', '=': 'eq'}
+UNARY = ('blank', 'nil', 'bool', 'even', 'odd', 'num', 'str')
+_CLAUSE = re.compile(
+    r"\s*\{(?P<column>[^{}]*)\}\s+(?:"
+    rf"is\s+(?P<unary>{'|'.join(UNARY)})"
+    r"|(?P<case>[is]?)(?P<operator>>=|<=|!=|[<>=]|eq|ne|lt|le|gt|ge|contains|datestartswith)\s*(?P<value>.*?)"
+    r")\s*$",
+    re.S,
+)
+
+
+def split_filter_part(filter_part):
+    """Parse one clause into (column, operator, value, case_insensitive).
+
+    Relational clauses (`{column} i= value`) give the operator's name (`eq`), unary ones
+    (`{column} is blank`) `is blank` and no value. (None, None, None, False) when the
+    clause is not in the grammar.
+    """
+    match = _CLAUSE.fullmatch(filter_part)
+    if match is None:
+        return None, None, None, False
+    if match["unary"] is not None:
+        return match["column"], f"is {match['unary']}", None, False
+    value = match["value"]
+    if len(value) > 1 and value[0] == value[-1] and value[0] in ("'", '"', '`'):
+        value = value[1:-1].replace('\\' + value[0], value[0])
+    return match["column"], SYMBOLS.get(match["operator"], match["operator"]), value, match["case"] == "i"
+
+
+def _nothing(series):
+    return pd.Series(False, index=series.index)
+
+
+def _is_text(series):
+    return pd.api.types.is_string_dtype(series) or pd.api.types.is_object_dtype(series)
+
+
+def _unary(series, test):
+    if test in ('blank', 'nil'):
+        missing = series.isna()
+        if test == 'blank' and not pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_datetime64_any_dtype(series):
+            missing |= series.astype(str).str.strip().eq('')
+        return missing
+    if test == 'bool':
+        return series.notna() if pd.api.types.is_bool_dtype(series) else _nothing(series)
+    if test == 'str':
+        return series.notna() if _is_text(series) else _nothing(series)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        if test == 'num':
+            return series.notna()
+        if test in ('even', 'odd'):
+            return (series % 2).eq(0 if test == 'even' else 1)
+    return _nothing(series)
+
+
+def _condition(series, operator, value, case_insensitive):
+    """Boolean mask of the rows of `series` passing one clause.
+
+    Values that cannot be read as the column's type (e.g. `> abc` on amounts) match no row.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Evaluate once per category, then spread the result over the rows through the codes
+        # (missing values have code -1, which picks the value appended at the end)
+        matches = _condition(pd.Series(series.cat.categories), operator, value, case_insensitive).to_numpy(bool)
+        missing = operator in ('is blank', 'is nil')
+        return pd.Series(np.append(matches, missing)[series.cat.codes.to_numpy()], index=series.index)
+
+    if operator.startswith('is '):
+        return _unary(series, operator[3:])
+
+    if operator in ('contains', 'datestartswith'):
+        text = series.astype(str)
+        if operator == 'datestartswith':
+            return text.str.startswith(value) & series.notna()
+        return text.str.contains(value, case=not case_insensitive, regex=False, na=False)
+
+    try:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            value = pd.to_datetime(value)  # the table shows dates in ISO format
+        elif pd.api.types.is_numeric_dtype(series):
+            value = pd.to_numeric(value)
+    except (ValueError, TypeError, OverflowError):
+        return _nothing(series)
+    if pd.isna(value):
+        return _nothing(series)
+    if not pd.api.types.is_datetime64_any_dtype(series) and not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str)
+        if case_insensitive:
+            series, value = series.str.lower(), str(value).lower()
+    return {
+        'ge': series >= value, 'le': series <= value, 'lt': series < value,
+        'gt': series > value, 'ne': series != value, 'eq': series == value,
+    }[operator]
+
+
+def apply_table_query(frame, filter_query, sort_by):
+    """Filter and sort `frame` like a DataTable with custom filter and sort actions would."""
+    if filter_query:
+        mask = pd.Series(True, index=frame.index)
+        for part in filter_query.split(' && '):
+            column, operator, value, case_insensitive = split_filter_part(part)
+            if column not in frame.columns:
+                # A filter the table shows but that cannot be applied must not show every row
+                mask = pd.Series(False, index=frame.index)
+                break
+            mask &= _condition(frame[column], operator, value, case_insensitive)
+        frame = frame[mask]
+    if sort_by:
+        sort_by = [s for s in sort_by if s['column_id'] in frame.columns]
+        if sort_by:
+            frame = frame.sort_values(
+                [s['column_id'] for s in sort_by],
+                ascending=[s['direction'] == 'asc' for s in sort_by],
+                kind='stable'
+            )
+    return frame
+
+
+class QueryCache:
+    """Small LRU of query results, so that paging does not filter the dataset again."""
+
+    def __init__(self, max_entries=8):
+        self._entries = BoundedLRU(max_entries)
+
+    def query(self, dataset, filter_query, sort_by):
+        key = (
+            dataset.key, dataset.version, filter_query or '',
+            tuple((s['column_id'], s['direction']) for s in sort_by or [])
+        )
+        result = self._entries.get(key)
+        if result is None:
+            result = apply_table_query(dataset.frame, filter_query, sort_by)
+            self._entries.put(key, result)
+        return result
+
+    def clear(self):
+        self._entries.clear()
+
+
+QUERIES = QueryCache()